@@ -7,3 +7,5 @@ from .abilities import AbilitiesGenerator
 from .moves import MovesGenerator
 from .map_sections import MapSectionsGenerator
 from .maps import MapsGenerator
+from .api import ApiGenerator
+from .search import SearchGenerator
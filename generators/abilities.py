@@ -8,6 +8,16 @@ from generators.base_generator import BaseGenerator
 
 
 class AbilitiesGenerator(BaseGenerator):
+    name = "abilities"
+    required_data = [
+        "ability_descriptions",
+        "ability_names",
+        "mon_base_stats",
+        "mon_species_names",
+        "national_to_species",
+        "type_names",
+    ]
+
     def prepare_template_data(self):
         """
         Prepares any additional data the page generator needs to
@@ -25,21 +35,21 @@ class AbilitiesGenerator(BaseGenerator):
         }
 
 
-    def generate(self, env):
+    def get_pages(self):
         """
-        Generates all of the ability pages into the distribution directory.
+        Returns all of the ability pages, along with the abilities listing.
         """
+        pages = []
         for ability in self.core_data["ability_names"]:
-            self.render_template(
-                env,
-                "ability.html",
-                "abilities/%s.html" % ability,
-                extra_data={
+            if self.include_entity("abilities", ability):
+                pages.append(("ability.html", "abilities/%s.html" % ability, {
                     'ability': ability,
-                }
-            )
+                }))
+
+        if not self.is_filtered("abilities"):
+            pages.append(("abilities.html", "abilities.html", {}))
 
-        self.render_template(env, "abilities.html", "abilities.html")
+        return pages
 
 
 def create_ability_map(mon_base_stats, national_to_species):
@@ -0,0 +1,246 @@
+#--------------------------------------------------------------------
+# linoone: api.py
+#
+# Generator for the static JSON data API. Writes one JSON shard per
+# species, move, and map, along with index files that list them.
+#--------------------------------------------------------------------
+import hashlib
+import json
+import os
+
+from generators.base_generator import BaseGenerator
+from util.build_cache import write_if_changed
+
+# Version of the data API's format. It's part of the API's path, so it
+# must be bumped whenever a shard's structure changes incompatibly.
+API_VERSION = 1
+
+
+class ApiGenerator(BaseGenerator):
+    name = "api"
+    required_data = [
+        "constant_names",
+        "id_to_species",
+        "item_to_move",
+        "maps",
+        "mon_base_stats",
+        "mon_dex_entries",
+        "mon_egg_moves",
+        "mon_evolutions",
+        "mon_learnsets",
+        "mon_species_names",
+        "mon_tmhm_learnsets",
+        "mon_tutor_moves",
+        "move_descriptions",
+        "move_names",
+        "move_to_item",
+        "moves",
+        "national_to_species",
+        "region_map_sections",
+        "wild_mons",
+    ]
+
+    def generate_assets(self):
+        """
+        Writes the data API into the distribution directory.
+        """
+        self.generate_api()
+
+
+    def generate_api(self):
+        """
+        Writes a shard for each species, move, and map, named by its
+        constant name (or its id, for maps).
+        Each kind of entity also has an index file, which lists the hash of
+        every shard's content, so consumers only need to fetch the shards
+        that changed. Shards are only rewritten when their content changed,
+        so they stay cached across builds. The index files are skipped in
+        partial builds, since they would be incomplete.
+        """
+        api_dir = os.path.join(self.config["dist_dir"], "api", "v%d" % API_VERSION)
+        wild_encounters = get_wild_encounters(self.core_data["wild_mons"])
+        # Each kind of entity is named the same as its entity filter.
+        shards = {
+            "species": self.create_species_shards(wild_encounters),
+            "moves": self.create_move_shards(),
+            "maps": self.create_map_shards(wild_encounters),
+        }
+
+        kinds = {}
+        for kind, kind_shards in shards.items():
+            kind_dir = os.path.join(api_dir, kind)
+            os.makedirs(kind_dir, exist_ok=True)
+            entries = {}
+            for entity_id, shard in kind_shards.items():
+                content = serialize_json(shard)
+                entries[entity_id] = {
+                    "name": shard["name"],
+                    "hash": hash_content(content),
+                }
+                write_if_changed(os.path.join(kind_dir, "%s.json" % entity_id), content)
+
+            if self.is_filtered(kind):
+                continue
+
+            # Remove the shards of entities that no longer exist.
+            for filename in os.listdir(kind_dir):
+                entity_id, extension = os.path.splitext(filename)
+                if extension == ".json" and entity_id != "index" and entity_id not in entries:
+                    os.remove(os.path.join(kind_dir, filename))
+
+            content = serialize_json({"version": API_VERSION, "entries": entries})
+            write_if_changed(os.path.join(kind_dir, "index.json"), content)
+            kinds[kind] = {"path": "%s/index.json" % kind, "hash": hash_content(content)}
+
+        if len(kinds) == len(shards):
+            write_if_changed(os.path.join(api_dir, "index.json"), serialize_json({"version": API_VERSION, "kinds": kinds}))
+
+
+    def create_species_shards(self, wild_encounters):
+        """
+        Creates the shard of each selected species.
+        """
+        encounter_maps = {}
+        for map_id, encounters in wild_encounters.items():
+            for field_type, field_encounters in encounters.items():
+                if field_type == "map":
+                    continue
+                for mon in field_encounters["mons"]:
+                    species = self.core_data["id_to_species"][mon["species"]]
+                    encounter_maps.setdefault(species, set()).add(map_id)
+
+        item_to_move = self.core_data["item_to_move"]
+        result = {}
+        for national_num, species in self.core_data["national_to_species"].items():
+            if species not in self.core_data["mon_base_stats"] or not self.include_entity("species", species):
+                continue
+
+            species_name = self.get_constant_name("species", species)
+            result[species_name] = {
+                "id": species_name,
+                "national_num": int(national_num),
+                "name": self.core_data["mon_species_names"][species],
+                "dex_entry": self.core_data["mon_dex_entries"].get(national_num),
+                "base_stats": self.create_base_stats(self.core_data["mon_base_stats"][species]),
+                "evolutions": [
+                    dict(evolution, dest_species=self.get_constant_name("species", evolution["dest_species"]))
+                    for evolution in self.core_data["mon_evolutions"].get(species, [])
+                ],
+                "levelup_moves": [
+                    {"level": item["level"], "move": self.get_constant_name("moves", item["move"])}
+                    for item in self.core_data["mon_learnsets"].get(species, [])
+                ],
+                "tmhm_moves": [
+                    {"item": self.get_constant_name("items", item), "move": self.get_constant_name("moves", item_to_move[item])}
+                    for item in self.core_data["mon_tmhm_learnsets"].get(species, [])
+                ],
+                "egg_moves": [self.get_constant_name("moves", move) for move in self.core_data["mon_egg_moves"].get(species, [])],
+                "tutor_moves": [self.get_constant_name("moves", move) for move in self.core_data["mon_tutor_moves"].get(species, [])],
+                "maps": sorted(encounter_maps.get(species, [])),
+            }
+
+        return result
+
+
+    def create_base_stats(self, base_stats):
+        """
+        Returns a copy of the species' base stats, with the types,
+        abilities, and held items referenced by their constant names.
+        """
+        result = dict(base_stats)
+        for field in ["type1", "type2"]:
+            if field in result:
+                result[field] = self.get_constant_name("types", result[field])
+        for field in ["item1", "item2"]:
+            if field in result:
+                result[field] = self.get_constant_name("items", result[field])
+        if "abilities" in result:
+            result["abilities"] = [self.get_constant_name("abilities", ability) for ability in result["abilities"]]
+
+        return result
+
+
+    def create_move_shards(self):
+        """
+        Creates the shard of each selected move. MOVE_NONE isn't a real
+        move, so it doesn't have a shard.
+        """
+        move_to_item = self.core_data["move_to_item"]
+        result = {}
+        for move, move_name in self.core_data["move_names"].items():
+            if move not in self.core_data["moves"] or not self.include_entity("moves", move):
+                continue
+
+            move_constant = self.get_constant_name("moves", move)
+            if move_constant == "MOVE_NONE":
+                continue
+
+            move_data = dict(self.core_data["moves"][move])
+            if "type" in move_data:
+                move_data["type"] = self.get_constant_name("types", move_data["type"])
+            item = move_to_item.get(move)
+            result[move_constant] = {
+                "id": move_constant,
+                "name": move_name,
+                "description": self.core_data["move_descriptions"].get(move, ""),
+                "data": move_data,
+                "item": self.get_constant_name("items", item) if item is not None else None,
+            }
+
+        return result
+
+
+    def get_constant_name(self, kind, entity_id):
+        """
+        Returns the constant name of the entity, such as SPECIES_TREECKO.
+        Unlike the numeric ids in the core data, constant names don't
+        change when a project inserts new entities. Entities without a
+        constant keep their ids.
+        """
+        return self.core_data["constant_names"][kind].get(entity_id, entity_id)
+
+
+    def create_map_shards(self, wild_encounters):
+        """
+        Creates the shard of each selected map.
+        """
+        region_map_sections = self.core_data["region_map_sections"]
+        result = {}
+        for map_id, map_data in self.core_data["maps"].items():
+            if not self.include_entity("maps", map_id):
+                continue
+
+            section = map_data["region_map_section"]
+            result[map_id] = {
+                "id": map_id,
+                "name": map_id,
+                "region_map_section": section,
+                "region_map_section_name": region_map_sections[section]["name"] if section in region_map_sections else None,
+                "layout": map_data["layout"],
+                "connections": map_data["connections"] or [],
+                "warp_events": map_data["warp_events"] or [],
+                "wild_encounters": wild_encounters.get(map_id),
+            }
+
+        return result
+
+
+def get_wild_encounters(wild_mons):
+    """
+    Returns the main wild encounters of each map.
+    """
+    main_group = next(group for group in wild_mons["wild_encounter_groups"] if group["label"] == "gWildMonHeaders")
+    return {encounters["map"]: encounters for encounters in main_group["encounters"]}
+
+
+def serialize_json(data):
+    """
+    Serializes the data as compact JSON. Keys are sorted, so the same
+    data always has the same content and hash.
+    """
+    return json.dumps(data, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+
+
+def hash_content(content):
+    return hashlib.sha1(content.encode("utf-8")).hexdigest()[:10]
+
@@ -3,13 +3,32 @@
 #
 # Base artifact generator. Facilitates pages and asset generation.
 #--------------------------------------------------------------------
+import json
 import os
 
+from util.build_cache import BuildCache, write_if_changed
+
+# Directory of the static files, such as scripts, that are copied into
+# the distribution directory as-is.
+STATIC_DIR = os.path.join(os.path.dirname(os.path.realpath(__file__)), "..", "static")
+
 class BaseGenerator:
     """
     Base class that all artifact generators inherit. Child class
     generators should override methods as needed.
     """
+    # Name used to select the generator from the command line.
+    name = None
+
+    # Core data keys that the generator and its templates use. Only
+    # these are loaded when the generator is run on its own.
+    required_data = []
+
+    # Distribution subdirectories that the generator's assets are
+    # written to, and the ones it reads assets from.
+    asset_dirs = []
+    required_asset_dirs = []
+
     def __init__(self, config, core_data, core_funcs, project_settings):
         self.config = config
         self.core_data = core_data
@@ -27,18 +46,38 @@ class BaseGenerator:
         self.generate(env)
 
 
-    def render_template(self, env, template_name, dest_filepath, extra_data={}):
+    def render_page(self, env, template_name, extra_data={}, dest_filepath=None):
         """
-        Renders the final template to the destinatino filepath.
+        Renders the template and returns the resulting page content. The
+        page's destination filepath is used to resolve relative urls.
         """
         template = env.get_template(template_name)
-        output = template.render(
+        core_funcs = dict(self.core_funcs, make_url=self.get_make_url(dest_filepath))
+        return template.render(
             **self.config,
-            **self.core_funcs,
+            **core_funcs,
             **self.core_data,
             **self.custom_data,
             **extra_data
         )
+
+
+    def get_make_url(self, dest_filepath=None):
+        """
+        Returns the make_url() function for the file at the given
+        distribution path, which resolves urls relative to the file in
+        relative mode.
+        """
+        if "url_resolver" in self.core_funcs:
+            return self.core_funcs["url_resolver"].for_page(dest_filepath)
+        return self.core_funcs["make_url"]
+
+
+    def render_template(self, env, template_name, dest_filepath, extra_data={}):
+        """
+        Renders the final template to the destinatino filepath.
+        """
+        output = self.render_page(env, template_name, extra_data, dest_filepath)
         filepath = os.path.join(self.config["dist_dir"], dest_filepath)
         file_dir = os.path.dirname(os.path.realpath(filepath))
         os.makedirs(file_dir, exist_ok=True)
@@ -46,6 +85,60 @@ class BaseGenerator:
             f.write(output)
 
 
+    def include_entity(self, kind, entity):
+        """
+        Returns whether or not the given entity was selected for
+        generation. Everything is selected when there is no filter
+        for the entity's kind.
+        """
+        entity_filters = self.config.get("entity_filters", {})
+        return kind not in entity_filters or entity in entity_filters[kind]
+
+
+    def is_filtered(self, kind):
+        """
+        Returns whether or not only a subset of the given entity kind
+        was selected for generation.
+        """
+        return kind in self.config.get("entity_filters", {})
+
+
+    def load_build_cache(self, name):
+        """
+        Loads the named build cache, which tracks the inputs that the
+        generated files were built from.
+        """
+        return BuildCache(os.path.join(self.config["cache_dir"], "%s.json" % name))
+
+
+    def write_static_file(self, filename, dest_filepath):
+        """
+        Copies the file from the static directory to the destination
+        distribution path, unless it's already up to date.
+        """
+        with open(os.path.join(STATIC_DIR, filename), "r", encoding="utf-8") as f:
+            content = f.read()
+
+        filepath = os.path.join(self.config["dist_dir"], dest_filepath)
+        os.makedirs(os.path.dirname(filepath), exist_ok=True)
+        write_if_changed(filepath, content)
+
+
+    def write_table_dataset(self, table_name, columns):
+        """
+        Writes the columnar dataset of a listing table, along with the
+        names of the types that its rows reference. The dataset is a script
+        that registers it under the table's name, so pages can load it with
+        a script tag, which also works when they're opened from the file
+        system. The file is only rewritten when its content changed.
+        """
+        filepath = os.path.join(self.config["dist_dir"], "tables", "%s.js" % table_name)
+        os.makedirs(os.path.dirname(filepath), exist_ok=True)
+        dataset = json.dumps({"columns": columns, "type_names": self.core_data["type_names"]}, separators=(",", ":"), ensure_ascii=False)
+        content = "window.linooneTables = window.linooneTables || {};\nwindow.linooneTables[%s] = %s;\n" % (json.dumps(table_name), dataset)
+        write_if_changed(filepath, content)
+
+
     def prepare_template_data(self):
         """
         Prepares any additional data the generator needs to render
@@ -55,8 +148,45 @@ class BaseGenerator:
         return {}
 
 
+    def get_pages(self):
+        """
+        Returns the list of pages the generator renders. Each page is a
+        tuple of (template_name, dest_filepath, extra_data).
+        """
+        return []
+
+
+    def generate_assets(self):
+        """
+        Generates any non-page assets, such as images, into the
+        distribution directory.
+        """
+        pass
+
+
+    def update_asset_manifest(self):
+        """
+        Writes content-hashed copies of the generator's assets, if asset
+        hashing is enabled.
+        """
+        asset_manifest = self.config.get("asset_manifest")
+        if asset_manifest is None or len(self.asset_dirs) == 0:
+            return
+
+        for asset_dir in self.asset_dirs:
+            asset_manifest.update(asset_dir)
+        asset_manifest.save()
+
+        # Urls that were resolved before the assets were hashed are stale.
+        if "url_resolver" in self.core_funcs:
+            self.core_funcs["url_resolver"].clear()
+
+
     def generate(self, env):
         """
         Generates the artifact(s) into the distribution directory.
         """
-        pass
+        self.generate_assets()
+        self.update_asset_manifest()
+        for template_name, dest_filepath, extra_data in self.get_pages():
+            self.render_template(env, template_name, dest_filepath, extra_data)
@@ -7,8 +7,11 @@ from generators.base_generator import BaseGenerator
 
 
 class IndexGenerator(BaseGenerator):
-    def generate(self, env):
+    name = "index"
+    required_data = ["mon_species_names"]
+
+    def get_pages(self):
         """
-        Generates all of the Pokémon type pages into the distribution directory.
+        Returns the homepage.
         """
-        self.render_template(env, "index.html", "index.html")
+        return [("index.html", "index.html", {})]
@@ -6,11 +6,21 @@
 import os
 
 from generators.base_generator import BaseGenerator
+from util.build_cache import hash_file, hash_values
+from util.file_formats import parse_jasc_file
+from util.tilemap import create_image, read_tilemap, render_tilemap, tiles_from_image
 
-from PIL import Image, ImageDraw
+from PIL import Image
 
 
 class MapSectionsGenerator(BaseGenerator):
+    name = "map_sections"
+    required_data = [
+        "maps",
+        "region_map_sections",
+    ]
+    asset_dirs = ["images/region_map"]
+
     def prepare_template_data(self):
         """
         Prepares any additional data the page generator needs to
@@ -26,68 +36,80 @@ class MapSectionsGenerator(BaseGenerator):
         }
 
 
-    def generate(self, env):
+    def generate_assets(self):
+        """
+        Generates the region map image into the distribution directory.
         """
-        Generates all of the map section pages into the distribution directory.
+        self.generate_region_map_pic()
+
+
+    def get_pages(self):
         """
-        self.generate_region_map_section_pics(self.core_data["region_map_sections"])
+        Returns all of the map section pages, along with the map sections listing.
+        """
+        pages = []
         for map_section in self.core_data["region_map_sections"]:
-            self.render_template(
-                env,
-                "map_section.html",
-                "map_sections/%s.html" % map_section,
-                extra_data={
+            if self.include_entity("map_sections", map_section):
+                pages.append(("map_section.html", "map_sections/%s.html" % map_section, {
                     'map_section': map_section,
-                }
-            )
+                }))
+
+        if not self.is_filtered("map_sections"):
+            pages.append(("map_sections.html", "map_sections.html", {}))
 
-        self.render_template(env, "map_sections.html", "map_sections.html")
+        return pages
 
 
-    def generate_region_map_section_pics(self, region_map_sections, force=False):
+    def generate_region_map_pic(self, force=False):
         """
-        Generates a region map image with the map section highlighted for each map section.
+        Generates the region map image. Map sections are highlighted on top of
+        it in the pages, so the image is shared by all of the map sections. The
+        image is only regenerated when the region map graphics have changed
+        since it was last built.
         """
-        dest_images_dir = os.path.join(self.config["dist_dir"], "images/region_map_sections")
+        dest_images_dir = os.path.join(self.config["dist_dir"], "images/region_map")
         os.makedirs(dest_images_dir, exist_ok=True)
-        tiles_filepath = os.path.join(self.config["project_dir"], "graphics/pokenav/region_map/map.png")
-        tilemap_filepath = os.path.join(self.config["project_dir"], "graphics/pokenav/region_map/map.bin")
+        settings = self.project_settings["region_map"]
+        tiles_filepath = os.path.join(self.config["project_dir"], settings.tiles_filepath)
+        tilemap_filepath = os.path.join(self.config["project_dir"], settings.tilemap_filepath)
+        palette_filepath = None
+        if settings.palette_filepath is not None:
+            palette_filepath = os.path.join(self.config["project_dir"], settings.palette_filepath)
+        cache = self.load_build_cache("region_map_pic")
+        cache.remove_missing(self.config["dist_dir"], "images/region_map")
+        key = "images/region_map/map.png"
+        digest = hash_values(
+            hash_file(tiles_filepath),
+            hash_file(tilemap_filepath),
+            hash_file(palette_filepath) if palette_filepath is not None else "",
+            vars(settings)
+        )
+        if not force and cache.is_current(key, digest):
+            return
+
+        img = self.create_region_map_image(tiles_filepath, tilemap_filepath, palette_filepath)
+        img.save(os.path.join(self.config["dist_dir"], key))
+        cache.set(key, digest)
+        cache.save()
+
+
+    def create_region_map_image(self, tiles_filepath, tilemap_filepath, palette_filepath=None):
+        """
+        Renders the visible area of the region map from its tiles and tilemap.
+        """
+        settings = self.project_settings["region_map"]
         tiles_img = Image.open(tiles_filepath)
-        tiles_img_width = tiles_img.size[0] // 8
+        tiles = tiles_from_image(tiles_img)
         with open(tilemap_filepath, "rb") as f:
-            tilemap = bytes(f.read())
-
-        base_map_image = Image.new("P", (240, 160))
-        base_map_image.putpalette(tiles_img.getpalette())
-        for y in range(20):
-            for x in range(30):
-                tile_id = tilemap[y * 64 + x]
-                row = tile_id // tiles_img_width
-                column = tile_id % tiles_img_width
-                src_x = column * 8
-                src_y = row * 8
-                dest_x = x * 8
-                dest_y = y * 8
-                tile_img = tiles_img.crop((src_x, src_y, src_x + 8, src_y + 8))
-                base_map_image.paste(tile_img, (dest_x, dest_y))
-        base_map_image = base_map_image.convert("RGB")
-
-        for mapsec_id in region_map_sections:
-            map_section = region_map_sections[mapsec_id]
-            dest_filepath = os.path.join(self.config["dist_dir"], "images/region_map_sections/%s.png" % (mapsec_id))
-            if force or not os.path.exists(dest_filepath):
-                img = base_map_image.copy()
-                draw = ImageDraw.Draw(img)
-                pixel_x = (map_section["x"] + 1) * 8
-                pixel_y = (map_section["y"] + 2) * 8
-                width = map_section["width"] * 8
-                height = map_section["height"] * 8
-                left = pixel_x - 4
-                top = pixel_y - 4
-                right = pixel_x + width + 3
-                bottom = pixel_y + height + 3
-                draw.rectangle([left, top, right, bottom], outline="#FF00FF", width=4)
-                img.save(dest_filepath)
+            entries = read_tilemap(f.read(), settings.tilemap_width, settings.affine)
+
+        entries = entries[:settings.visible_height, :settings.visible_width]
+        indices = render_tilemap(tiles, entries, settings.bpp, settings.affine)
+        palette = tiles_img.getpalette()
+        if palette_filepath is not None:
+            palette = parse_jasc_file(palette_filepath)
+
+        return create_image(indices, palette)
 
 
 def create_map_sections_map(maps, region_map_sections):
@@ -4,13 +4,48 @@
 # Page generator for the individual map pages.
 #--------------------------------------------------------------------
 import os
+from concurrent.futures import ProcessPoolExecutor
 
 from generators.base_generator import BaseGenerator
+from generators.view_models import create_mon_views
+from util.build_cache import hash_file, hash_values
+from util.file_formats import parse_jasc_file
+from util.lru_cache import LRUCache
+from util.tilemap import create_image, render_blocks, render_metatiles, tiles_from_image
 
-from PIL import Image, ImageDraw
+import numpy as np
+from PIL import Image
+
+# Wild encounter tables that are shown on the map pages, in order. Each
+# is an encounter type, the group within it, if any, and its title.
+ENCOUNTER_TABLES = [
+    ("land_mons", None, "Walking"),
+    ("water_mons", None, "Surfing"),
+    ("rock_smash_mons", None, "Rock Smash"),
+    ("fishing_mons", "old_rod", "Fishing - Old Rod"),
+    ("fishing_mons", "good_rod", "Fishing - Good Rod"),
+    ("fishing_mons", "super_rod", "Fishing - Super Rod"),
+]
 
 
 class MapsGenerator(BaseGenerator):
+    name = "maps"
+    required_data = [
+        "id_to_species",
+        "map_layouts",
+        "maps",
+        "mon_base_stats",
+        "mon_species_names",
+        "national_to_species",
+        "region_map_sections",
+        "species_to_id",
+        "species_to_national",
+        "tilesets",
+        "type_names",
+        "wild_mons",
+    ]
+    asset_dirs = ["images/layouts"]
+
     def prepare_template_data(self):
         """
         Prepares any additional data the page generator needs to
@@ -23,23 +58,160 @@ class MapsGenerator(BaseGenerator):
         )
         map_encounters = create_encounters_mapping(self.core_data["wild_mons"], get_encounter_info, self.core_data["id_to_species"])
         return {
-            "map_encounters": map_encounters,
+            "map_views": self.create_map_views(map_encounters),
         }
 
 
-    def generate(self, env):
+    def create_map_views(self, map_encounters):
         """
-        Generates all of the map pages into the distribution directory.
+        Creates a record for each selected map's page, with the map's
+        connections and wild encounters already resolved. The records are
+        built in one pass, and every record shares the same Pokémon records.
         """
+        make_url = self.get_make_url("maps/")
+        mon_views = create_mon_views(self.core_data, make_url)
+        id_to_species = self.core_data["id_to_species"]
+        species_to_national = self.core_data["species_to_national"]
+        result = {}
+        for map_id, map_data in self.core_data["maps"].items():
+            if not self.include_entity("maps", map_id):
+                continue
+
+            warp_maps = []
+            for warp in map_data["warp_events"] or []:
+                if warp["dest_map"] not in warp_maps:
+                    warp_maps.append(warp["dest_map"])
+
+            encounter_tables = []
+            encounters = map_encounters.get(map_id, {})
+            for encounter_type, group, title in ENCOUNTER_TABLES:
+                if encounter_type not in encounters or (group is not None and group not in encounters[encounter_type]):
+                    continue
+
+                summaries = encounters[encounter_type] if group is None else encounters[encounter_type][group]
+                encounter_tables.append({
+                    "title": title,
+                    "mons": [
+                        dict(summary, mon=mon_views[species_to_national[id_to_species[species_id]]])
+                        for species_id, summary in summaries.items()
+                    ],
+                })
+
+            section = map_data["region_map_section"]
+            result[map_id] = {
+                "region_map_section": section,
+                "section_name": self.core_data["region_map_sections"][section]["name"],
+                "section_url": make_url("map_sections/%s.html" % section),
+                "layout": map_data["layout"] if map_data["layout"] in self.core_data["map_layouts"] else None,
+                "connections": [
+                    {"direction": connection["direction"], "map": connection["map"], "url": make_url("maps/%s.html" % connection["map"])}
+                    for connection in map_data["connections"] or []
+                ],
+                "warps": [{"map": dest_map, "url": make_url("maps/%s.html" % dest_map)} for dest_map in warp_maps],
+                "has_encounters": map_id in map_encounters,
+                "encounter_tables": encounter_tables,
+            }
+
+        return result
+
+
+    def get_pages(self):
+        """
+        Returns all of the map pages.
+        """
+        pages = []
         for map_id in self.core_data["maps"]:
-            self.render_template(
-                env,
-                "map.html",
-                "maps/%s.html" % map_id,
-                extra_data={
+            if self.include_entity("maps", map_id):
+                pages.append(("map.html", "maps/%s.html" % map_id, {
                     'map_id': map_id,
-                }
+                }))
+
+        return pages
+
+
+    def generate_assets(self):
+        """
+        Generates the map layout images into the distribution directory.
+        """
+        self.generate_layout_pics(self.core_data["maps"], self.core_data["map_layouts"], self.core_data["tilesets"])
+
+
+    def generate_layout_pics(self, maps, map_layouts, tilesets, force=False):
+        """
+        Renders the layouts of the maps in a pool of worker processes. Layouts
+        that use the same pair of tilesets are grouped into the same jobs, so
+        that the pair's metatiles are only decoded once per worker. Images are
+        only regenerated when the layout's blockdata or tilesets have changed
+        since they were last built.
+        """
+        dest_images_dir = os.path.join(self.config["dist_dir"], "images/layouts")
+        os.makedirs(dest_images_dir, exist_ok=True)
+        cache = self.load_build_cache("layout_pics")
+        cache.remove_missing(self.config["dist_dir"], "images/layouts")
+        tileset_digests = {}
+        def get_tileset_digest(label):
+            if label not in tileset_digests:
+                tileset = tilesets.get(label)
+                if tileset is None:
+                    tileset_digests[label] = ""
+                else:
+                    tileset_digests[label] = hash_values(
+                        hash_file(tileset["tiles_filepath"]) if tileset["tiles_filepath"] is not None else "",
+                        [hash_file(filepath) or "" for filepath in tileset["palette_filepaths"]],
+                        hash_file(tileset["metatiles_filepath"]) if tileset["metatiles_filepath"] is not None else ""
+                    )
+            return tileset_digests[label]
+
+        layout_ids = set()
+        for map_id in maps:
+            if self.include_entity("maps", map_id) and maps[map_id].get("layout") in map_layouts:
+                layout_ids.add(maps[map_id]["layout"])
+
+        pending_layouts = {}
+        for layout_id in sorted(layout_ids):
+            layout = map_layouts[layout_id]
+            key = "images/layouts/%s.png" % layout_id
+            digest = hash_values(
+                hash_file(layout["blockdata_filepath"]),
+                layout["width"],
+                layout["height"],
+                get_tileset_digest(layout["primary_tileset"]),
+                get_tileset_digest(layout["secondary_tileset"])
             )
+            if force or not cache.is_current(key, digest):
+                tileset_pair = (layout["primary_tileset"], layout["secondary_tileset"])
+                pending_layouts.setdefault(tileset_pair, []).append((layout_id, digest))
+
+        jobs = []
+        job_digests = []
+        for tileset_pair in sorted(pending_layouts):
+            layouts = pending_layouts[tileset_pair]
+            for i in range(0, len(layouts), LAYOUTS_PER_JOB):
+                chunk = layouts[i:i + LAYOUTS_PER_JOB]
+                jobs.append({
+                    "tileset_pair": tileset_pair,
+                    "primary_tileset": tilesets.get(tileset_pair[0]),
+                    "secondary_tileset": tilesets.get(tileset_pair[1]),
+                    "layouts": [{
+                        "id": layout_id,
+                        "dest_filepath": os.path.join(dest_images_dir, "%s.png" % layout_id),
+                        "blockdata_filepath": map_layouts[layout_id]["blockdata_filepath"],
+                        "width": map_layouts[layout_id]["width"],
+                        "height": map_layouts[layout_id]["height"],
+                    } for layout_id, digest in chunk],
+                })
+                job_digests.append(dict(chunk))
+
+        if len(jobs) > 0:
+            with ProcessPoolExecutor(max_workers=self.config.get("jobs")) as executor:
+                results = executor.map(process_layout_pics, jobs)
+                for digests, (built_layout_ids, messages) in zip(job_digests, results):
+                    for message in messages:
+                        print(message)
+                    for layout_id in built_layout_ids:
+                        cache.set("images/layouts/%s.png" % layout_id, digests[layout_id])
+
+        cache.save()
 
 
 def create_encounters_mapping(wild_mons, get_encounter_info, id_to_species):
@@ -172,3 +344,102 @@ def create_partitioned_encounter_summary_func(field, totals, main_group, species
         }
 
     return f
+
+
+# Emerald's limits for the number of tiles, metatiles, and palettes that
+# come from the primary tileset. The rest come from the secondary tileset.
+NUM_TILES_IN_PRIMARY = 512
+NUM_METATILES_IN_PRIMARY = 512
+NUM_PALS_IN_PRIMARY = 6
+NUM_PALS_TOTAL = 13
+
+# Blockdata entries hold the metatile id in their lower bits. The upper
+# bits are the collision and elevation, which aren't rendered.
+METATILE_ID_MASK = 0x3FF
+
+# Layouts are rendered in small batches, so that the tileset pairs that
+# are used by many layouts are still spread across the workers.
+LAYOUTS_PER_JOB = 16
+
+# Each worker process keeps the decoded metatiles of the tileset pairs it
+# recently rendered.
+metatiles_cache = LRUCache(8)
+
+
+def process_layout_pics(job):
+    """
+    Renders a batch of layouts that use the same pair of tilesets. Returns the
+    list of layout ids that were rendered, along with a list of messages about
+    layouts that were skipped.
+    """
+    messages = []
+    built_layout_ids = []
+    tileset_pair = job["tileset_pair"]
+    decoded = metatiles_cache.get(tileset_pair)
+    if decoded is None:
+        try:
+            decoded = decode_tileset_pair(job["primary_tileset"], job["secondary_tileset"])
+        except OSError as e:
+            for layout in job["layouts"]:
+                messages.append("Skipping layout %s because tilesets %s and %s couldn't be loaded: %s" % (layout["id"], tileset_pair[0], tileset_pair[1], e))
+            return built_layout_ids, messages
+        metatiles_cache.put(tileset_pair, decoded)
+
+    metatiles, palette = decoded
+    for layout in job["layouts"]:
+        if not os.path.exists(layout["blockdata_filepath"]):
+            messages.append("Skipping layout %s because %s doesn't exist." % (layout["id"], layout["blockdata_filepath"]))
+            continue
+
+        with open(layout["blockdata_filepath"], "rb") as f:
+            blocks = np.frombuffer(f.read(), dtype="<u2")
+
+        num_blocks = layout["width"] * layout["height"]
+        if len(blocks) < num_blocks:
+            messages.append("Skipping layout %s because %s is too small for its dimensions." % (layout["id"], layout["blockdata_filepath"]))
+            continue
+
+        blocks = (blocks[:num_blocks] & METATILE_ID_MASK).reshape(layout["height"], layout["width"])
+        img = create_image(render_blocks(metatiles, blocks), palette)
+        img.save(layout["dest_filepath"])
+        built_layout_ids.append(layout["id"])
+
+    return built_layout_ids, messages
+
+
+def decode_tileset_pair(primary_tileset, secondary_tileset):
+    """
+    Decodes the metatiles of a pair of tilesets. Returns the rendered metatiles,
+    indexed by metatile id, along with the combined palette. Missing tilesets
+    leave their tiles, metatiles, and palettes empty.
+    """
+    tiles = np.zeros((NUM_TILES_IN_PRIMARY * 2, 8, 8), dtype=np.uint8)
+    metatile_entries = np.zeros((NUM_METATILES_IN_PRIMARY * 2, 8), dtype=np.uint16)
+    palette = [0] * (256 * 3)
+    tileset_slots = (
+        (primary_tileset, 0, 0, range(0, NUM_PALS_IN_PRIMARY)),
+        (secondary_tileset, NUM_TILES_IN_PRIMARY, NUM_METATILES_IN_PRIMARY, range(NUM_PALS_IN_PRIMARY, NUM_PALS_TOTAL)),
+    )
+    for tileset, tiles_offset, metatiles_offset, palette_nums in tileset_slots:
+        if tileset is None:
+            continue
+
+        if tileset["tiles_filepath"] is not None:
+            tileset_tiles = tiles_from_image(Image.open(tileset["tiles_filepath"]))[:NUM_TILES_IN_PRIMARY]
+            tiles[tiles_offset:tiles_offset + len(tileset_tiles)] = tileset_tiles
+
+        if tileset["metatiles_filepath"] is not None:
+            with open(tileset["metatiles_filepath"], "rb") as f:
+                entries = np.frombuffer(f.read(), dtype="<u2")
+            entries = entries[:len(entries) // 8 * 8].reshape(-1, 8)[:NUM_METATILES_IN_PRIMARY]
+            metatile_entries[metatiles_offset:metatiles_offset + len(entries)] = entries
+
+        for palette_num in palette_nums:
+            if palette_num >= len(tileset["palette_filepaths"]):
+                continue
+            colors = parse_jasc_file(tileset["palette_filepaths"][palette_num])
+            if colors is not None:
+                colors = colors[:16 * 3]
+                palette[palette_num * 16 * 3:palette_num * 16 * 3 + len(colors)] = colors
+
+    return render_metatiles(tiles, metatile_entries), palette
@@ -5,91 +5,272 @@
 #--------------------------------------------------------------------
 import os
 import re
+from concurrent.futures import ProcessPoolExecutor
 
 from generators.base_generator import BaseGenerator
+from util.build_cache import hash_file, hash_values
 from util.file_formats import parse_jasc_file
 
 from PIL import Image
 
+# Digest of a source file that doesn't exist, so that the digests of the
+# images built from it are still valid.
+MISSING_FILE_DIGEST = "missing"
+
 
 class MonPicsGenerator(BaseGenerator):
-    def generate(self, env):
+    name = "mon_pics"
+    required_data = [
+        "mon_back_pics",
+        "mon_front_pics",
+        "mon_icon_pics",
+        "mon_shiny_palettes",
+        "species_to_national",
+        "type_icon_palette_slots",
+        "type_names",
+    ]
+    asset_dirs = ["images/pokemon", "images/types"]
+
+    def generate_assets(self):
         """
         Generates the various Pokémon image assets into the distribution directory.
         """
         poke_images_dir = os.path.join(self.config["dist_dir"], "images/pokemon")
         os.makedirs(poke_images_dir, exist_ok=True)
-        self.generate_mon_pics(self.core_data["mon_front_pics"], self.core_data["species_to_national"], "front", (0, 0, 64, 64))
-        self.generate_mon_pics(self.core_data["mon_back_pics"], self.core_data["species_to_national"], "back", (0, 0, 64, 64))
-        self.generate_shiny_mon_pics(self.core_data["mon_front_pics"], self.core_data["species_to_national"], "front", (0, 0, 64, 64), self.core_data["mon_shiny_palettes"])
-        self.generate_shiny_mon_pics(self.core_data["mon_back_pics"], self.core_data["species_to_national"], "back", (0, 0, 64, 64), self.core_data["mon_shiny_palettes"])
-        self.generate_mon_pics(self.core_data["mon_icon_pics"], self.core_data["species_to_national"], "icon", (0, 0, 32, 32))
+        self.generate_species_pics(
+            self.core_data["mon_front_pics"],
+            self.core_data["mon_back_pics"],
+            self.core_data["mon_icon_pics"],
+            self.core_data["mon_shiny_palettes"],
+            self.core_data["species_to_national"]
+        )
 
         type_images_dir = os.path.join(self.config["dist_dir"], "images/types")
         os.makedirs(type_images_dir, exist_ok=True)
         self.generate_type_pics(self.core_data["type_names"], self.core_data["type_icon_palette_slots"], self.project_settings["types"])
 
+        # Listing pages display many icons, so they are also packed into atlases.
+        self.generate_atlas("images/pokemon", r"(\d+)_icon\.png", "icons", "mon-icon", 32)
+        self.generate_atlas("images/types", r"(\d+)\.png", "types", "type-icon", 6)
+
 
-    def generate_mon_pics(self, species_to_pics, species_to_national, name, crop, force=False):
+    def generate_species_pics(self, front_pics, back_pics, icon_pics, mon_shiny_palettes, species_to_national, force=False):
         """
         Processes and generates the various mon images into the distribution directory.
+        Each species is processed as a separate job in a pool of worker processes.
+        Images are only regenerated when their source image, palette, or crop
+        has changed since they were last built.
         """
-        for species in species_to_pics:
-            if species not in species_to_national:
+        cache = self.load_build_cache("mon_pics")
+        cache.remove_missing(self.config["dist_dir"], "images/pokemon")
+        file_digests = {}
+        def get_file_digest(filepath):
+            if filepath not in file_digests:
+                digest = hash_file(filepath) if filepath is not None else None
+                file_digests[filepath] = digest if digest is not None else MISSING_FILE_DIGEST
+            return file_digests[filepath]
+
+        jobs = []
+        job_digests = []
+        for species in species_to_national:
+            if not self.include_entity("species", species):
                 continue
 
-            filepath = species_to_pics[species]
-            png_filepath = re.sub(r"\.4bpp.*", ".png", filepath)
-            dest_filepath = os.path.join(self.config["dist_dir"], "images/pokemon/%s_%s.png" % (species_to_national[species], name))
-            if force or not os.path.exists(dest_filepath):
-                if not os.path.exists(png_filepath):
-                    print("Skipping %s pic for species %s because %s doesn't exist." % (name, species, png_filepath))
-                else:
-                    img = Image.open(png_filepath)
-                    cropped_img = img.crop(crop)
-                    cropped_img.save(dest_filepath, transparency=0, optimize=1)
+            job = {
+                "species": species,
+                "dest_prefix": os.path.join(self.config["dist_dir"], "images/pokemon/%s" % species_to_national[species]),
+                "front_png": get_png_filepath(front_pics.get(species)),
+                "back_png": get_png_filepath(back_pics.get(species)),
+                "icon_png": get_png_filepath(icon_pics.get(species)),
+                "shiny_palette": None,
+                "variants": [],
+            }
+            if species in mon_shiny_palettes:
+                job["shiny_palette"] = re.sub(r"\.gbapal.*", ".pal", mon_shiny_palettes[species])
 
+            variant_sources = {
+                "front": ([job["front_png"]], MON_PIC_CROP),
+                "back": ([job["back_png"]], MON_PIC_CROP),
+                "front_shiny": ([job["front_png"], job["shiny_palette"]], MON_PIC_CROP),
+                "back_shiny": ([job["back_png"], job["shiny_palette"]], MON_PIC_CROP),
+                "icon": ([job["icon_png"]], MON_ICON_CROP),
+            }
+            digests = {}
+            for variant, (filepaths, crop) in variant_sources.items():
+                source_digests = [get_file_digest(filepath) for filepath in filepaths]
+                digests[variant] = hash_values(*source_digests, crop)
 
-    def generate_shiny_mon_pics(self, species_to_pics, species_to_national, name, crop, mon_shiny_palettes, force=False):
-        """
-        Processes and generates the various shiny mon images into the distribution directory.
-        """
-        for species in species_to_pics:
-            if species not in species_to_national:
-                continue
+                # Variants with missing source files can't be built, so they
+                # aren't queued. Their digests change once the files exist.
+                if MISSING_FILE_DIGEST in source_digests:
+                    if filepaths[0] is not None and not variant.endswith("_shiny"):
+                        print("Skipping %s pic for species %s because %s doesn't exist." % (variant, species, filepaths[0]))
+                    continue
+
+                key = "images/pokemon/%s_%s.png" % (species_to_national[species], variant)
+                if force or not cache.is_current(key, digests[variant]):
+                    job["variants"].append(variant)
+
+            if len(job["variants"]) > 0:
+                jobs.append(job)
+                job_digests.append(digests)
 
-            filepath = species_to_pics[species]
-            png_filepath = re.sub(r"\.4bpp.*", ".png", filepath)
-            dest_filepath = os.path.join(self.config["dist_dir"], "images/pokemon/%s_%s_shiny.png" % (species_to_national[species], name))
-            if force or not os.path.exists(dest_filepath):
-                try:
-                    img = Image.open(png_filepath)
-                    cropped_img = img.crop(crop)
-                    if img.mode == "P" and species in mon_shiny_palettes and os.path.exists(mon_shiny_palettes[species]) and (force or not os.path.exists(dest_filepath)):
-                        palette_filepath = re.sub(r"\.gbapal.*", ".pal", mon_shiny_palettes[species])
-                        shiny_palette = parse_jasc_file(palette_filepath)
-                        if shiny_palette is not None:
-                            cropped_img.putpalette(shiny_palette)
-                            cropped_img.save(dest_filepath, transparency=0, optimize=1)
-                except FileNotFoundError:
-                    print("Skipping shiny %s pic for species %s because %s doesn't exist." % (name, species, png_filepath))
+        if len(jobs) > 0:
+            with ProcessPoolExecutor(max_workers=self.config.get("jobs")) as executor:
+                results = executor.map(process_species_pics, jobs, chunksize=8)
+                for job, digests, (built_variants, messages) in zip(jobs, job_digests, results):
+                    for message in messages:
+                        print(message)
+                    for variant in built_variants:
+                        key = "images/pokemon/%s_%s.png" % (species_to_national[job["species"]], variant)
+                        cache.set(key, digests[variant])
+
+        cache.save()
 
 
     def generate_type_pics(self, type_names, type_icon_palette_slots, type_settings, force=False):
         """
         Generates the Pokémon type icon images.
         """
+        cache = self.load_build_cache("type_pics")
+        cache.remove_missing(self.config["dist_dir"], "images/types")
         palettes_cache = {}
         for t in type_names:
+            if not self.include_entity("types", t):
+                continue
+
             source_filepath = os.path.join(self.config["project_dir"], type_settings.types[t]["icon_filepath"])
             dest_filepath = os.path.join(self.config["dist_dir"], "images/types/%s.png" % t)
             slot = type_icon_palette_slots[t]
             palette_filepath = os.path.join(self.config["project_dir"], "graphics/types/%s" % type_settings.palette_slot_files[slot])
             if palette_filepath not in palettes_cache:
                 palette = parse_jasc_file(palette_filepath)
-                palettes_cache[palette_filepath] = palette
+                palettes_cache[palette_filepath] = (palette, hash_file(palette_filepath))
 
-            if force or not os.path.exists(dest_filepath):
+            palette, palette_digest = palettes_cache[palette_filepath]
+            key = "images/types/%s.png" % t
+            digest = hash_values(hash_file(source_filepath), palette_digest)
+            if force or not cache.is_current(key, digest):
                 img = Image.open(source_filepath)
-                img.putpalette(palettes_cache[palette_filepath])
-                img.save(dest_filepath, transparency=0, optimize=1)
+                img.putpalette(palette)
+                img.save(dest_filepath, transparency=0)
+                cache.set(key, digest)
+
+        cache.save()
+
+
+    def generate_atlas(self, images_dir, pattern, atlas_name, css_class, columns):
+        """
+        Packs the images in the given distribution subdirectory whose filenames
+        match the pattern into a single atlas image. Also writes a stylesheet
+        with a class for each image that displays it from the atlas. The
+        pattern's first group is used as the id in the image's class name.
+        """
+        dir_path = os.path.join(self.config["dist_dir"], images_dir)
+        entries = []
+        for filename in os.listdir(dir_path):
+            match = re.fullmatch(pattern, filename)
+            if match:
+                entries.append((match.group(1), filename))
+        entries.sort(key=lambda entry: int(entry[0]))
+        if len(entries) == 0:
+            return
+
+        cache = self.load_build_cache("atlases")
+        cache.remove_missing(self.config["dist_dir"], images_dir)
+        # The atlas and its stylesheet are tracked separately, so that both
+        # are rebuilt if either one is missing.
+        keys = ["%s/%s.png" % (images_dir, atlas_name), "%s/%s.css" % (images_dir, atlas_name)]
+        digest = hash_values([(entry_id, hash_file(os.path.join(dir_path, filename))) for entry_id, filename in entries], columns)
+        if all(cache.is_current(key, digest) for key in keys):
+            return
+
+        images = [Image.open(os.path.join(dir_path, filename)).convert("RGBA") for entry_id, filename in entries]
+        cell_width = max(img.width for img in images)
+        cell_height = max(img.height for img in images)
+        num_rows = (len(images) + columns - 1) // columns
+        atlas = Image.new("RGBA", (cell_width * min(columns, len(images)), cell_height * num_rows), (0, 0, 0, 0))
+        css_rules = [".%s { display: inline-block; background-image: url(%s.png); background-repeat: no-repeat; }" % (css_class, atlas_name)]
+        for i, img in enumerate(images):
+            x = (i % columns) * cell_width
+            y = (i // columns) * cell_height
+            atlas.paste(img, (x, y))
+            css_rules.append(".%s-%s { width: %dpx; height: %dpx; background-position: %dpx %dpx; }" % (
+                css_class, entries[i][0], img.width, img.height, -x, -y
+            ))
+
+        atlas.save(os.path.join(dir_path, "%s.png" % atlas_name))
+        with open(os.path.join(dir_path, "%s.css" % atlas_name), "w", encoding="utf-8") as f:
+            f.write("\n".join(css_rules) + "\n")
+
+        for key in keys:
+            cache.set(key, digest)
+        cache.save()
+
+
+# Regions of the source images that are used for the mon pics.
+MON_PIC_CROP = (0, 0, 64, 64)
+MON_ICON_CROP = (0, 0, 32, 32)
+
+
+def process_species_pics(job):
+    """
+    Generates the requested image variants for a single species. Each source
+    image is only decoded once, even though it's used for multiple images.
+    Returns the list of variants that were generated, along with a list of
+    messages about images that were skipped.
+    """
+    messages = []
+    built_variants = []
+    species = job["species"]
+    variants = job["variants"]
+
+    shiny_palette = None
+    if ("front_shiny" in variants or "back_shiny" in variants) and job["shiny_palette"] is not None and os.path.exists(job["shiny_palette"]):
+        shiny_palette = parse_jasc_file(job["shiny_palette"])
+
+    for name, png_filepath in (("front", job["front_png"]), ("back", job["back_png"])):
+        shiny_name = "%s_shiny" % name
+        make_normal = name in variants
+        make_shiny = shiny_name in variants
+        if png_filepath is None or (not make_normal and not make_shiny):
+            continue
+
+        if not os.path.exists(png_filepath):
+            if make_normal:
+                messages.append("Skipping %s pic for species %s because %s doesn't exist." % (name, species, png_filepath))
+            if make_shiny:
+                messages.append("Skipping shiny %s pic for species %s because %s doesn't exist." % (name, species, png_filepath))
+            continue
+
+        img = Image.open(png_filepath)
+        cropped_img = img.crop(MON_PIC_CROP)
+        if make_normal:
+            cropped_img.save("%s_%s.png" % (job["dest_prefix"], name), transparency=0)
+            built_variants.append(name)
+        if make_shiny and img.mode == "P" and shiny_palette is not None:
+            cropped_img.putpalette(shiny_palette)
+            cropped_img.save("%s_%s.png" % (job["dest_prefix"], shiny_name), transparency=0)
+            built_variants.append(shiny_name)
+
+    icon_png = job["icon_png"]
+    if "icon" in variants and icon_png is not None:
+        if not os.path.exists(icon_png):
+            messages.append("Skipping icon pic for species %s because %s doesn't exist." % (species, icon_png))
+        else:
+            img = Image.open(icon_png)
+            cropped_img = img.crop(MON_ICON_CROP)
+            cropped_img.save("%s_icon.png" % job["dest_prefix"], transparency=0)
+            built_variants.append("icon")
+
+    return built_variants, messages
+
+
+def get_png_filepath(gfx_filepath):
+    """
+    Gets the source .png filepath for the given compiled gfx filepath.
+    """
+    if gfx_filepath is None:
+        return None
+
+    return re.sub(r"\.4bpp.*", ".png", gfx_filepath)
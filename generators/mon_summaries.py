@@ -3,16 +3,65 @@
 #
 # Page generator for the Pokémon summary pages.
 #--------------------------------------------------------------------
-import base64
 import os
 import re
+from concurrent.futures import ThreadPoolExecutor
+from xml.sax.saxutils import quoteattr
 
-from graphviz import Digraph
+try:
+    from graphviz import Digraph
+except ImportError:
+    Digraph = None
 
 from generators.base_generator import BaseGenerator
+from generators.view_models import create_matchup_views, create_mon_views, create_move_views
+from util.build_cache import hash_values
+from util.evolution_chart import render_evolution_chart
+from util.stat_analytics import BASE_STAT_LABELS, create_stat_analytics
+from util.type_matchups import create_defensive_profiles
+
+# Keeps the sprites sharp, and highlights the species whose node id is
+# the fragment of the chart's url.
+EVOLUTION_CHART_STYLE = '<style>svg { image-rendering: pixelated; } .node:target polygon { stroke: red; stroke-width: 2px; }</style>'
+
+# Stat suffixes of the EV yield fields, and how the summary page labels
+# them.
+EV_YIELD_LABELS = [
+    ("HP", "HP"),
+    ("Attack", "Atk"),
+    ("Defense", "Def"),
+    ("SpAttack", "Sp.Atk"),
+    ("SpDefense", "Sp.Def"),
+    ("Speed", "Speed"),
+]
 
 
 class MonSummariesGenerator(BaseGenerator):
+    name = "mon_summaries"
+    required_data = [
+        "ability_names",
+        "id_to_species",
+        "item_to_move",
+        "items",
+        "mon_base_stats",
+        "mon_dex_entries",
+        "mon_egg_moves",
+        "mon_evolutions",
+        "mon_learnsets",
+        "mon_species_names",
+        "mon_tmhm_learnsets",
+        "mon_tutor_moves",
+        "move_names",
+        "moves",
+        "national_to_species",
+        "species_to_national",
+        "type_effectiveness",
+        "type_names",
+        "wild_mons",
+    ]
+    asset_dirs = ["images/evolutions"]
+    required_asset_dirs = ["images/pokemon"]
+
     def prepare_template_data(self):
         """
         Prepares any additional data the page generator needs to
@@ -20,30 +69,122 @@ class MonSummariesGenerator(BaseGenerator):
         that will be exposed to the template.
         """
         evolution_map = self.create_evolution_sets()
-        evolution_svgs = self.create_evolution_svgs(evolution_map)
-        encounters_map = create_encounters_map(self.core_data["wild_mons"], self.core_data["id_to_species"])
+        evolution_charts = {}
+        for family, family_species in self.get_evolution_families(evolution_map):
+            for species in family_species:
+                evolution_charts[species] = self.get_evolution_chart_path(family)
         return {
-            "evolution_map": evolution_map,
-            "encounters_map": encounters_map,
-            "evolution_svgs": evolution_svgs,
+            "evolution_charts": evolution_charts,
+            "mon_views": self.create_species_views(),
         }
 
 
-    def generate(self, env):
+    def get_pages(self):
+        """
+        Returns all of the Pokémon summary pages.
+        """
+        pages = []
+        for national_num, species in self.get_summary_species():
+            pages.append(("mon_summary.html", "pokedex/%s.html" % national_num, {
+                "national_num": national_num,
+                "species": species,
+            }))
+
+        return pages
+
+
+    def get_summary_species(self):
         """
-        Generates all of the Pokémon summary pages into the distribution directory.
+        Returns the national dex number and species of each selected
+        species that has a summary page.
         """
+        result = []
         for national_num in self.core_data["national_to_species"]:
-            if national_num in self.core_data["mon_dex_entries"]:
-                self.render_template(
-                    env,
-                    "mon_summary.html",
-                    "pokedex/%s.html" % national_num,
-                    extra_data={
-                        "national_num": national_num,
-                        "species": self.core_data["national_to_species"][national_num],
-                    }
-                )
+            species = self.core_data["national_to_species"][national_num]
+            if national_num in self.core_data["mon_dex_entries"] and self.include_entity("species", species):
+                result.append((national_num, species))
+
+        return result
+
+
+    def create_species_views(self):
+        """
+        Creates a record for each summary page's species, with everything
+        the page displays already resolved. The records are built in one
+        pass, and every record shares the same move and Pokémon records.
+        The stat analytics and type matchups are computed for every species
+        at once. Asset urls are left to the template, since assets can be
+        rehashed after this.
+        """
+        make_url = self.get_make_url("pokedex/")
+        move_views = create_move_views(self.core_data, make_url)
+        mon_views = create_mon_views(self.core_data, make_url)
+        stat_analytics = create_stat_analytics(self.core_data["mon_base_stats"], self.core_data["national_to_species"])["species"]
+        species_to_national = self.core_data["species_to_national"]
+        defensive_profiles = create_defensive_profiles(
+            self.core_data["type_effectiveness"],
+            self.core_data["type_names"],
+            self.core_data["mon_base_stats"],
+            self.core_data["national_to_species"]
+        )
+        encounters_map = create_encounters_map(self.core_data["wild_mons"], self.core_data["id_to_species"])
+        ability_names = self.core_data["ability_names"]
+        type_names = self.core_data["type_names"]
+        items = self.core_data["items"]
+        item_to_move = self.core_data["item_to_move"]
+        mon_egg_moves = self.core_data["mon_egg_moves"]
+        mon_tutor_moves = self.core_data["mon_tutor_moves"]
+
+        result = {}
+        for national_num, species in self.get_summary_species():
+            base_stats = self.core_data["mon_base_stats"][species]
+            analytics = stat_analytics[species]
+            dex_entry = self.core_data["mon_dex_entries"][national_num]
+
+            types = [base_stats["type1"]]
+            if base_stats["type2"] != base_stats["type1"]:
+                types.append(base_stats["type2"])
+            abilities = [base_stats["abilities"][0]]
+            if base_stats["abilities"][1] != "0":
+                abilities.append(base_stats["abilities"][1])
+
+            result[species] = {
+                "name": self.core_data["mon_species_names"][species],
+                "description": dex_entry["description"].replace("\\n", " "),
+                "category": dex_entry["categoryName"],
+                "types": [{"name": type_names[t], "url": make_url("types/%s.html" % t)} for t in types],
+                "abilities": [{"name": ability_names[a], "url": make_url("abilities/%s.html" % a)} for a in abilities],
+                "catch_rate": base_stats["catchRate"],
+                "exp_yield": base_stats["expYield"],
+                "ev_yields": [
+                    {"amount": base_stats["evYield_%s" % stat], "label": label}
+                    for stat, label in EV_YIELD_LABELS if base_stats["evYield_%s" % stat] != "0"
+                ],
+                "base_stats": [
+                    {"label": label, "value": base_stats["base%s" % stat], "percentile": percentile}
+                    for (stat, label), percentile in zip(BASE_STAT_LABELS, analytics["stat_percentiles"])
+                ],
+                "base_stat_total": {"value": analytics["total"], "percentile": analytics["total_percentile"]},
+                "type_ranks": [
+                    {"name": type_names[t], "url": make_url("types/%s.html" % t), **analytics["type_ranks"][t]}
+                    for t in types
+                ],
+                "similar_mons": [mon_views[species_to_national[other]] for other in analytics["similar"]],
+                "defenses": create_matchup_views(defensive_profiles[species], type_names, make_url),
+                "levelup_moves": [
+                    {"level": item["level"], "move": move_views[item["move"]]}
+                    for item in self.core_data["mon_learnsets"][species]
+                ],
+                "tmhm_moves": [
+                    {"item": items[item]["name"], "move": move_views[item_to_move[item]]}
+                    for item in self.core_data["mon_tmhm_learnsets"][species]
+                ],
+                "egg_moves": [move_views[move] for move in mon_egg_moves[species]] if species in mon_egg_moves else None,
+                "tutor_moves": [move_views[move] for move in mon_tutor_moves[species]] if species in mon_tutor_moves else None,
+                "locations": [{"name": map_id, "url": make_url("maps/%s.html" % map_id)} for map_id in encounters_map.get(species, [])],
+            }
+
+        return result
 
 
     def create_evolution_sets(self):
@@ -75,45 +216,117 @@ class MonSummariesGenerator(BaseGenerator):
         return evos_map
 
 
-    def create_evolution_svgs(self, evolution_map):
+    def generate_assets(self):
+        """
+        Generates the evolution chart of each evolution family into the
+        distribution directory.
+        """
+        self.generate_evolution_charts()
+
+
+    def get_evolution_families(self, evolution_map):
+        """
+        Returns the evolution families that have at least one selected
+        species. Each family is a tuple of all of its species and its
+        selected species.
+        """
+        families = []
+        for family in find_evolution_families(evolution_map):
+            family_species = [
+                species for species in family
+                if species in self.core_data["mon_base_stats"] and self.include_entity("species", species)
+            ]
+            if len(family_species) > 0:
+                families.append((family, family_species))
+
+        return families
+
+
+    def get_evolution_chart_path(self, family):
         """
-        Uses graphviz to generate an SVG to display the full
-        evolution chain for each species.
+        Returns the distribution path of the evolution family's chart.
         """
-        # Navigate to the pokemon images distribution directory so that
-        # graphviz can load the images properly. We return back to the
-        # current directory once the graphviz work is completed.
-        cur_dir = os.getcwd()
-        os.chdir(os.path.join(self.config["dist_dir"], "images/pokemon"))
+        return "images/evolutions/%s.svg" % self.core_data["species_to_national"][family[0]]
+
+
+    def generate_evolution_charts(self, force=False):
+        """
+        Lays out an SVG chart of each evolution family. The charts are
+        separate files that every family member's page links to, and a
+        species is highlighted by linking to its node's id. Charts are
+        only laid out again when their family's graph changed.
+        """
+        evolution_map = self.create_evolution_sets()
+        dest_dir = os.path.join(self.config["dist_dir"], "images/evolutions")
+        os.makedirs(dest_dir, exist_ok=True)
+        cache = self.load_build_cache("evolution_charts")
+        cache.remove_missing(self.config["dist_dir"], "images/evolutions")
+        layout = self.config.get("evolution_layout", "native")
+
+        families = []
+        for family, family_species in self.get_evolution_families(evolution_map):
+            key = self.get_evolution_chart_path(family)
+            graph = self.create_family_graph(family[0], evolution_map, key)
+            digest = hash_values(graph, layout, self.get_sprite_urls(graph, key))
+            if force or not cache.is_current(key, digest):
+                families.append((key, graph, digest))
 
-        svgs = {}
+        if layout == "graphviz":
+            if Digraph is None:
+                raise Exception("The graphviz evolution layout requires the graphviz Python package.")
+            # Each family is laid out by its own dot process, so a bounded
+            # pool of threads keeps several of them running at once.
+            with ThreadPoolExecutor(max_workers=self.config.get("jobs")) as executor:
+                family_svgs = list(executor.map(lambda family: render_graphviz_svg(family[1]), families))
+        else:
+            family_svgs = [render_evolution_chart(graph) for key, graph, digest in families]
+
+        for (key, graph, digest), svg_content in zip(families, family_svgs):
+            svg_content = self.link_sprites(svg_content, graph, key)
+            with open(os.path.join(self.config["dist_dir"], key), "w", encoding="utf-8") as f:
+                f.write(svg_content)
+            cache.set(key, digest)
+
+        cache.save()
+
+
+    def create_family_graph(self, initial_species, evolution_map, chart_path):
+        """
+        Builds the graph of the evolution family of the given species. The
+        nodes link to the species' pages from the chart at the given
+        distribution path.
+        """
         species_names = self.core_data["mon_species_names"]
-        species_to_national = self.core_data["species_to_national"]
-        for species in self.core_data["mon_base_stats"]:
-            if species in evolution_map and (len(evolution_map[species]["to"]) > 0 or len(evolution_map[species]["from"]) > 0):
-                dot = Digraph("%s Evolution Chain" % species_names[species], format="svg", node_attr={"shape": "box"}, graph_attr={"rankdir": "LR"})
-                self.add_species_node(dot, species, highlight=True)
-                self.build_evolution_graph(dot, species, evolution_map, set(), set())
-                svg_content = dot.pipe().decode("utf-8")
-                # Swap in the base64-encoded image data instead of the SVG's
-                # image path. Using paths is super problematic because of the way
-                # graphviz initially loads images and renders them inside the SVG.
-                # It makes generating functional SVGs for both local and live-web
-                # scenarios nearly impossible.
-                img_paths = re.findall(r'"\w+\.png"', svg_content)
-                for img_path in img_paths:
-                    with open(img_path.strip('"'), "rb") as img_f:
-                        encoded_img = base64.b64encode(img_f.read()).decode("ascii")
-                        img_content = '"data:image/png;base64,%s"' % encoded_img
-                        svg_content = svg_content.replace(img_path, img_content)
-
-                svgs[species] = svg_content
-
-        os.chdir(cur_dir)
-        return svgs
-
-
-    def build_evolution_graph(self, dot, initial_species, evolution_map, visited, edges):
+        make_url = self.get_make_url(chart_path)
+        graph = {"title": "%s Evolution Chain" % species_names[initial_species], "nodes": [], "edges": []}
+        self.add_species_node(graph, initial_species, make_url)
+        self.build_evolution_graph(graph, initial_species, evolution_map, set(), set(), make_url)
+        return graph
+
+
+    def get_sprite_urls(self, graph, chart_path):
+        """
+        Returns the urls of the graph's sprites, as linked from the chart
+        at the given distribution path.
+        """
+        make_url = self.get_make_url(chart_path)
+        return {node["image"]: make_url(node["sprite"]) for node in graph["nodes"]}
+
+
+    def link_sprites(self, svg_content, graph, chart_path):
+        """
+        Swaps the sprites' image paths in the SVG for their urls, and adds
+        the style that highlights the linked species' node. The layout
+        needs the image files, so the nodes use absolute image paths, but
+        the chart has to link to the sprites the same way the pages do.
+        """
+        for img_path, url in self.get_sprite_urls(graph, chart_path).items():
+            svg_content = svg_content.replace('"%s"' % img_path, quoteattr(url))
+
+        return re.sub(r"(<svg\b[^>]*>)", r"\1\n" + EVOLUTION_CHART_STYLE, svg_content, count=1)
+
+
+    def build_evolution_graph(self, graph, initial_species, evolution_map, visited, edges, make_url):
         """
         Recursively builds the evolution graph starting at the
         given species.
@@ -126,48 +339,89 @@ class MonSummariesGenerator(BaseGenerator):
             species = evo["species"]
             edge_name = "%s:%s" % (species, initial_species)
             if edge_name not in edges:
-                self.add_species_node(dot, species)
-                self.add_species_edge(dot, species, initial_species, evo)
+                self.add_species_node(graph, species, make_url)
+                self.add_species_edge(graph, species, initial_species, evo)
                 edges.add(edge_name)
-            self.build_evolution_graph(dot, species, evolution_map, visited, edges)
+            self.build_evolution_graph(graph, species, evolution_map, visited, edges, make_url)
 
         for evo in evolution_map[initial_species]["to"]:
             species = evo["species"]
             edge_name = "%s:%s" % (initial_species, species)
             if edge_name not in edges:
-                self.add_species_node(dot, species)
-                self.add_species_edge(dot, initial_species, species, evo)
+                self.add_species_node(graph, species, make_url)
+                self.add_species_edge(graph, initial_species, species, evo)
                 edges.add(edge_name)
-            self.build_evolution_graph(dot, species, evolution_map, visited, edges)
+            self.build_evolution_graph(graph, species, evolution_map, visited, edges, make_url)
 
 
-    def add_species_node(self, dot, species, highlight=False):
+    def add_species_node(self, graph, species, make_url):
+        if any(node["id"] == species for node in graph["nodes"]):
+            return
+
         national_num = self.core_data["species_to_national"][species]
-        img_path = "%s_front.png" % national_num
+        sprite = "images/pokemon/%s_front.png" % national_num
+        # The image path is absolute, since graphviz loads the image
+        # relative to the current directory.
+        graph["nodes"].append({
+            "id": species,
+            "label": self.core_data["mon_species_names"][species],
+            "href": make_url("pokedex/%s.html" % national_num),
+            "image": os.path.abspath(os.path.join(self.config["dist_dir"], sprite)),
+            "sprite": sprite,
+        })
+
+
+    def add_species_edge(self, graph, from_species, to_species, evo):
+        evo_description = self.project_settings["evolution_methods"].get_label(evo["method"], evo["param"], self.core_data["items"])
+        graph["edges"].append({
+            "from": from_species,
+            "to": to_species,
+            "label": evo_description,
+        })
+
+
+def render_graphviz_svg(graph):
+    """
+    Lays out an evolution graph with graphviz and returns the SVG.
+    """
+    dot = Digraph(graph["title"], format="svg", node_attr={"shape": "box"}, graph_attr={"rankdir": "LR"})
+    for node in graph["nodes"]:
         label = """<<table border="0">
             <tr><td>%s</td></tr>
             <tr><td><img scale="true" src="%s" /></td></tr>
-        </table>>""" % (
-            self.core_data["mon_species_names"][species],
-            img_path
-        )
-        href = self.core_funcs["make_url"]("pokedex/%s.html" % self.core_data["species_to_national"][species])
-        extra_args = {}
-        if highlight:
-            extra_args["style"] = "bold"
-            extra_args["color"] = "red"
-
-        dot.node(
-            species,
-            href=href,
-            label=label,
-            **extra_args
-        )
+        </table>>""" % (node["label"], node["image"])
+        dot.node(node["id"], id=node["id"], href=node["href"], target="_top", label=label)
+    for edge in graph["edges"]:
+        dot.edge(edge["from"], edge["to"], label=" %s" % edge["label"])
 
+    return dot.pipe().decode("utf-8")
 
-    def add_species_edge(self, dot, from_species, to_species, evo):
-        evo_description = self.project_settings["evolution_methods"].get_label(evo["method"], evo["param"], self.core_data["items"])
-        dot.edge(from_species, to_species, label=" %s" % evo_description)
+
+def find_evolution_families(evolution_map):
+    """
+    Groups the species in the evolution mapping into families of species
+    that are connected by evolutions, using union-find. Each family is a
+    list of species, in the order they appear in the evolution mapping.
+    """
+    parents = {species: species for species in evolution_map}
+    def find(species):
+        while parents[species] != species:
+            parents[species] = parents[parents[species]]
+            species = parents[species]
+        return species
+
+    for species in evolution_map:
+        for evo in evolution_map[species]["to"]:
+            root = find(species)
+            dest_root = find(evo["species"])
+            if root != dest_root:
+                parents[dest_root] = root
+
+    families = {}
+    for species in evolution_map:
+        families.setdefault(find(species), []).append(species)
+
+    return list(families.values())
 
 
 def create_encounters_map(wild_mons, id_to_species):
@@ -5,15 +5,48 @@
 # moves.
 #--------------------------------------------------------------------
 from generators.base_generator import BaseGenerator
+from generators.view_models import create_mon_views, create_move_views
 
 
 class MovesGenerator(BaseGenerator):
+    name = "moves"
+    required_data = [
+        "item_to_move",
+        "items",
+        "mon_base_stats",
+        "mon_egg_moves",
+        "mon_learnsets",
+        "mon_species_names",
+        "mon_tmhm_learnsets",
+        "mon_tutor_moves",
+        "move_descriptions",
+        "move_names",
+        "move_to_item",
+        "moves",
+        "national_to_species",
+        "type_names",
+    ]
+    asset_dirs = ["tables"]
+    required_asset_dirs = ["tables"]
+
     def prepare_template_data(self):
         """
         Prepares any additional data the page generator needs to
         render itself. Returns a dict of variables and/or functions
         that will be exposed to the template.
         """
+        return {
+            "move_views": self.create_move_page_views(),
+        }
+
+
+    def create_move_page_views(self):
+        """
+        Creates a record for each selected move's page, with the move's
+        data and the Pokémon that learn it already resolved. The records
+        are built in one pass, and every record shares the same Pokémon
+        records.
+        """
         levelup_move_mons = create_levelup_move_map(
             self.core_data["mon_learnsets"],
             self.core_data["national_to_species"]
@@ -31,31 +64,80 @@ class MovesGenerator(BaseGenerator):
             self.core_data["mon_tutor_moves"],
             self.core_data["national_to_species"]
         )
-        sorted_moves = get_sorted_moves(self.core_data["move_names"])
-        return {
-            "levelup_move_mons": levelup_move_mons,
-            "tmhm_move_mons": tmhm_move_mons,
-            "egg_move_mons": egg_move_mons,
-            "tutor_move_mons": tutor_move_mons,
-            "sorted_moves": sorted_moves,
-        }
+
+        make_url = self.get_make_url("moves/")
+        move_views = create_move_views(self.core_data, make_url)
+        mon_views = create_mon_views(self.core_data, make_url)
+        move_to_item = self.core_data["move_to_item"]
+        result = {}
+        for move, move_view in move_views.items():
+            if not self.include_entity("moves", move):
+                continue
+
+            result[move] = dict(move_view,
+                description=self.core_data["move_descriptions"].get(move, "").replace("\\n", " "),
+                item_name=self.core_data["items"][move_to_item[move]]["name"] if move in move_to_item else None,
+                levelup_mons=[
+                    {"mon": mon_views[item["national_num"]], "level": item["level"]}
+                    for item in levelup_move_mons[move]
+                ] if move in levelup_move_mons else None,
+                tmhm_mons=[mon_views[national_num] for national_num in tmhm_move_mons[move]] if move in tmhm_move_mons else None,
+                egg_mons=[mon_views[national_num] for national_num in egg_move_mons[move]] if move in egg_move_mons else None,
+                tutor_mons=[mon_views[national_num] for national_num in tutor_move_mons[move]] if move in tutor_move_mons else None
+            )
+
+        return result
 
 
-    def generate(self, env):
+    def get_pages(self):
         """
-        Generates all of the move pages into the distribution directory.
+        Returns all of the move pages, along with the moves listing.
         """
+        pages = []
         for move in self.core_data["move_names"]:
-            self.render_template(
-                env,
-                "move.html",
-                "moves/%s.html" % move,
-                extra_data={
+            if self.include_entity("moves", move):
+                pages.append(("move.html", "moves/%s.html" % move, {
                     'move': move,
-                }
-            )
+                }))
+
+        if not self.is_filtered("moves"):
+            pages.append(("moves.html", "moves.html", {}))
+
+        return pages
 
-        self.render_template(env, "moves.html", "moves.html")
+
+    def generate_assets(self):
+        """
+        Writes the moves table's dataset and script into the distribution
+        directory. They're skipped when the moves are filtered, along with
+        the moves listing.
+        """
+        if self.is_filtered("moves"):
+            return
+
+        self.write_static_file("table.js", "tables/table.js")
+        self.write_table_dataset("moves", self.create_moves_dataset())
+
+
+    def create_moves_dataset(self):
+        """
+        Creates the columns of the moves table, with one array per column
+        and one entry per move, sorted by name.
+        """
+        columns = {column: [] for column in ["id", "name", "types", "power", "accuracy", "pp"]}
+        for move in get_sorted_moves(self.core_data["move_names"]):
+            if move not in self.core_data["moves"]:
+                continue
+
+            move_data = self.core_data["moves"][move]
+            columns["id"].append(move)
+            columns["name"].append(self.core_data["move_names"][move])
+            columns["types"].append([move_data["type"]])
+            columns["power"].append(int(move_data["power"]))
+            columns["accuracy"].append(int(move_data["accuracy"]))
+            columns["pp"].append(int(move_data["pp"]))
+
+        return columns
 
 
 def create_levelup_move_map(mon_learnsets, national_to_species):
@@ -5,25 +5,76 @@
 #--------------------------------------------------------------------
 from generators.base_generator import BaseGenerator
 
+# Base stat columns of the pokedex table, and the base stats field that
+# each one is read from.
+BASE_STAT_COLUMNS = [
+    ("hp", "baseHP"),
+    ("attack", "baseAttack"),
+    ("defense", "baseDefense"),
+    ("sp_attack", "baseSpAttack"),
+    ("sp_defense", "baseSpDefense"),
+    ("speed", "baseSpeed"),
+]
+
 
 class PokedexGenerator(BaseGenerator):
-    def prepare_template_data(self):
+    name = "pokedex"
+    required_data = [
+        "mon_base_stats",
+        "mon_species_names",
+        "national_to_species",
+        "type_names",
+    ]
+    asset_dirs = ["tables"]
+    required_asset_dirs = ["tables"]
+
+    def get_pages(self):
+        """
+        Returns the pokedex page, unless the species are filtered.
+        """
+        pages = []
+        if not self.is_filtered("species"):
+            pages.append(("pokedex.html", "pokedex.html", {}))
+
+        return pages
+
+
+    def generate_assets(self):
         """
-        Prepares any additional data the page generator needs to
-        render itself. Returns a dict of variables and/or functions
-        that will be exposed to the template.
+        Writes the pokedex table's dataset and script into the distribution
+        directory. They're skipped when the species are filtered, along
+        with the pokedex listing.
         """
-        national_dex_numbers = get_sorted_national_dex_numbers(self.core_data['national_to_species'])
-        return {
-            'national_dex_numbers': national_dex_numbers,
-        }
+        if self.is_filtered("species"):
+            return
+
+        self.write_static_file("table.js", "tables/table.js")
+        self.write_table_dataset("pokedex", self.create_pokedex_dataset())
 
 
-    def generate(self, env):
+    def create_pokedex_dataset(self):
         """
-        Generates the pokedex page into the distribution directory.
+        Creates the columns of the pokedex table, with one array per column
+        and one entry per Pokémon, in national dex order.
         """
-        self.render_template(env, "pokedex.html", "pokedex.html")
+        columns = {column: [] for column in ["national_num", "name", "types"] + [column for column, field in BASE_STAT_COLUMNS] + ["total"]}
+        for national_num in get_sorted_national_dex_numbers(self.core_data["national_to_species"]):
+            species = self.core_data["national_to_species"][national_num]
+            if species not in self.core_data["mon_base_stats"]:
+                continue
+
+            base_stats = self.core_data["mon_base_stats"][species]
+            types = [base_stats["type1"]]
+            if base_stats["type2"] != base_stats["type1"]:
+                types.append(base_stats["type2"])
+            columns["national_num"].append(int(national_num))
+            columns["name"].append(self.core_data["mon_species_names"][species])
+            columns["types"].append(types)
+            for column, field in BASE_STAT_COLUMNS:
+                columns[column].append(int(base_stats[field]))
+            columns["total"].append(sum(int(base_stats[field]) for column, field in BASE_STAT_COLUMNS))
+
+        return columns
 
 
 def get_sorted_national_dex_numbers(national_to_species):
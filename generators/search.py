@@ -0,0 +1,162 @@
+#--------------------------------------------------------------------
+# linoone: search.py
+#
+# Generator for the client-side search index. Writes an inverted
+# index of the names of the website's entities, which the search box
+# on every page queries without a server.
+#--------------------------------------------------------------------
+import json
+import os
+import re
+
+from generators.base_generator import BaseGenerator
+from util.asset_manifest import HASHED_FILENAME_PATTERN
+from util.build_cache import hash_values, write_if_changed
+
+# Tokens are indexed by each of their prefixes up to this length. Longer
+# query words are looked up by their prefix, and the results are then
+# filtered by the full word.
+MAX_PREFIX_LENGTH = 8
+
+
+class SearchGenerator(BaseGenerator):
+    name = "search"
+    required_data = [
+        "ability_names",
+        "item_to_move",
+        "items",
+        "maps",
+        "mon_base_stats",
+        "mon_species_names",
+        "move_names",
+        "national_to_species",
+        "region_map_sections",
+    ]
+    asset_dirs = ["search"]
+
+    def generate_assets(self):
+        """
+        Writes the search index and its client script into the
+        distribution directory.
+        """
+        self.generate_search_index()
+
+
+    def generate_search_index(self, force=False):
+        """
+        Writes the searchable documents, and an index of them that is
+        sharded by the first character of each token, so that a query only
+        fetches the shards of its words' first characters. Each file is
+        only rewritten when the documents changed or the file is missing.
+        The index is skipped in partial builds, since it would be
+        incomplete.
+        """
+        if len(self.config.get("entity_filters", {})) > 0:
+            return
+
+        search_dir = os.path.join(self.config["dist_dir"], "search")
+        os.makedirs(search_dir, exist_ok=True)
+        self.write_static_file("search.js", "search/search.js")
+
+        cache = self.load_build_cache("search_index")
+        cache.remove_missing(self.config["dist_dir"], "search")
+        docs = self.create_search_docs()
+        shards = create_search_shards(docs)
+        files = {"search/docs.json": docs}
+        for shard_name, shard in shards.items():
+            files["search/%s.json" % shard_name] = shard
+
+        digest = hash_values(docs, MAX_PREFIX_LENGTH)
+        if not force and all(cache.is_current(key, digest) for key in files):
+            return
+
+        for key, data in files.items():
+            write_if_changed(os.path.join(self.config["dist_dir"], key), serialize_search_data(data))
+            cache.set(key, digest)
+
+        # Remove the shards of characters that no longer start any token.
+        # Hashed copies are cleaned up by the asset manifest.
+        for filename in os.listdir(search_dir):
+            if HASHED_FILENAME_PATTERN.match(filename):
+                continue
+            if filename.endswith(".json") and "search/%s" % filename not in files:
+                os.remove(os.path.join(search_dir, filename))
+
+        cache.retain(files)
+        cache.save()
+
+
+    def create_search_docs(self):
+        """
+        Creates the list of searchable documents. Each document is a list
+        of its kind, its name, and the distribution path of its page, if
+        it has one.
+        """
+        docs = []
+        for national_num, species in self.core_data["national_to_species"].items():
+            if species in self.core_data["mon_base_stats"]:
+                docs.append(["Pokémon", self.core_data["mon_species_names"][species], "pokedex/%s.html" % national_num])
+
+        for move, move_name in self.core_data["move_names"].items():
+            docs.append(["Move", move_name, "moves/%s.html" % move])
+
+        for ability, ability_name in self.core_data["ability_names"].items():
+            docs.append(["Ability", ability_name, "abilities/%s.html" % ability])
+
+        # Items don't have pages, except that TMs and HMs link to the move
+        # they teach.
+        for item, item_data in self.core_data["items"].items():
+            move = self.core_data["item_to_move"].get(item)
+            docs.append(["Item", item_data["name"], "moves/%s.html" % move if move is not None else None])
+
+        for map_section, section_data in self.core_data["region_map_sections"].items():
+            docs.append(["Area", section_data["name"], "map_sections/%s.html" % map_section])
+
+        for map_id in self.core_data["maps"]:
+            docs.append(["Map", map_id, "maps/%s.html" % map_id])
+
+        return [doc for doc in docs if len(tokenize(doc[1])) > 0]
+
+
+def tokenize(text):
+    """
+    Splits the text into lowercase alphanumeric words. Map ids, such as
+    "MAP_ROUTE101", are split at their underscores.
+    """
+    return re.findall(r"[^\W_]+", text.lower())
+
+
+def create_search_shards(docs):
+    """
+    Creates the inverted index of the documents' names. Every prefix of
+    every token maps to the sorted ids of the documents whose names
+    contain it, and the prefixes are grouped into shards by their first
+    character. The index is built in one pass over the tokens.
+    """
+    shards = {}
+    for doc_id, doc in enumerate(docs):
+        for token in set(tokenize(doc[1])):
+            shard = shards.setdefault(get_shard_name(token), {})
+            for length in range(1, min(len(token), MAX_PREFIX_LENGTH) + 1):
+                doc_ids = shard.setdefault(token[:length], [])
+                # Documents are visited in order, so each list stays sorted.
+                if len(doc_ids) == 0 or doc_ids[-1] != doc_id:
+                    doc_ids.append(doc_id)
+
+    return shards
+
+
+def get_shard_name(token):
+    """
+    Returns the name of the shard that the token is indexed in. Tokens are
+    sharded by their first character, and characters that aren't safe in
+    filenames share a single shard.
+    """
+    first = token[0]
+    if re.match(r"[a-z0-9]", first):
+        return first
+    return "other"
+
+
+def serialize_search_data(data):
+    return json.dumps(data, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
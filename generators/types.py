@@ -5,9 +5,24 @@
 # Pokémon that have each typing.
 #--------------------------------------------------------------------
 from generators.base_generator import BaseGenerator
+from generators.view_models import create_matchup_views
+from util.stat_analytics import BASE_STAT_LABELS, create_stat_analytics
+from util.type_matchups import create_type_matchups
 
 
 class TypesGenerator(BaseGenerator):
+    name = "types"
+    required_data = [
+        "mon_base_stats",
+        "mon_species_names",
+        "move_names",
+        "moves",
+        "national_to_species",
+        "species_to_national",
+        "type_effectiveness",
+        "type_names",
+    ]
+
     def prepare_template_data(self):
         """
         Prepares any additional data the page generator needs to
@@ -24,25 +39,37 @@ class TypesGenerator(BaseGenerator):
             self.core_data["moves"],
             self.core_data["move_names"]
         )
+        type_stats = create_type_stats(
+            create_stat_analytics(self.core_data["mon_base_stats"], self.core_data["national_to_species"]),
+            self.core_data["species_to_national"]
+        )
+        make_url = self.get_make_url("types/")
+        type_matchups = {}
+        for type_id, matchups in create_type_matchups(self.core_data["type_effectiveness"], self.core_data["type_names"]).items():
+            type_matchups[type_id] = {
+                "attacking": create_matchup_views(matchups["attacking"], self.core_data["type_names"], make_url),
+                "defending": create_matchup_views(matchups["defending"], self.core_data["type_names"], make_url),
+            }
         return {
+            "type_matchups": type_matchups,
             "type_mons_map": type_mons_map,
             "type_moves_map": type_moves_map,
+            "type_stats": type_stats,
         }
 
 
-    def generate(self, env):
+    def get_pages(self):
         """
-        Generates all of the Pokémon type pages into the distribution directory.
+        Returns all of the Pokémon type pages.
         """
+        pages = []
         for type_id in self.core_data["type_names"]:
-            self.render_template(
-                env,
-                "type.html",
-                "types/%s.html" % type_id,
-                extra_data={
+            if self.include_entity("types", type_id):
+                pages.append(("type.html", "types/%s.html" % type_id, {
                     'type_id': type_id,
-                }
-            )
+                }))
+
+        return pages
 
 
 def create_type_mons_map(type_names, mon_base_stats, national_to_species):
@@ -87,3 +114,30 @@ def create_type_moves_map(type_names, moves, move_names):
         type_moves_map[move] = sorted(type_moves_map[move], key=lambda m: move_names[m])
 
     return type_moves_map
+
+
+def create_type_stats(stat_analytics, species_to_national):
+    """
+    Create a convenient type mapping with the average base stats of each
+    type's Pokémon, and the base stat total and rank of each of them,
+    keyed by national dex number.
+    """
+    type_stats = {}
+    for type_id, analytics in stat_analytics["types"].items():
+        type_stats[type_id] = {
+            "average_stats": [
+                {"label": label, "value": value}
+                for (stat, label), value in zip(BASE_STAT_LABELS, analytics["average_stats"])
+            ],
+            "average_total": analytics["average_total"],
+            "mon_totals": {},
+        }
+
+    for species, analytics in stat_analytics["species"].items():
+        for type_id, type_rank in analytics["type_ranks"].items():
+            type_stats[type_id]["mon_totals"][species_to_national[species]] = {
+                "total": analytics["total"],
+                "rank": type_rank["rank"],
+            }
+
+    return type_stats
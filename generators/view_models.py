@@ -0,0 +1,81 @@
+#--------------------------------------------------------------------
+# linoone: view_models.py
+#
+# Builds the compact records that pages render from, with names,
+# urls, and stats already resolved from the core data.
+#--------------------------------------------------------------------
+
+
+def create_move_views(core_data, make_url):
+    """
+    Creates a record for each move, with everything a move's table row
+    displays. Pages share the same records, so each move is only resolved
+    once.
+    """
+    moves = core_data["moves"]
+    type_names = core_data["type_names"]
+    result = {}
+    for move, move_name in core_data["move_names"].items():
+        if move not in moves:
+            continue
+
+        move_data = moves[move]
+        move_type = move_data["type"]
+        result[move] = {
+            "name": move_name,
+            "url": make_url("moves/%s.html" % move),
+            "type": move_type,
+            "type_name": type_names[move_type],
+            "type_url": make_url("types/%s.html" % move_type),
+            "power": move_data["power"],
+            "accuracy": move_data["accuracy"],
+            "pp": move_data["pp"],
+        }
+
+    return result
+
+
+def create_mon_views(core_data, make_url):
+    """
+    Creates a record for each Pokémon, keyed by national dex number, with
+    everything a Pokémon's table row displays. Pages share the same
+    records, so each Pokémon is only resolved once.
+    """
+    mon_base_stats = core_data["mon_base_stats"]
+    type_names = core_data["type_names"]
+    result = {}
+    for national_num, species in core_data["national_to_species"].items():
+        if species not in mon_base_stats:
+            continue
+
+        base_stats = mon_base_stats[species]
+        types = [base_stats["type1"]]
+        if base_stats["type2"] != base_stats["type1"]:
+            types.append(base_stats["type2"])
+        result[national_num] = {
+            "national_num": national_num,
+            "name": core_data["mon_species_names"][species],
+            "url": make_url("pokedex/%s.html" % national_num),
+            "types": [{"id": t, "name": type_names[t], "url": make_url("types/%s.html" % t)} for t in types],
+        }
+
+    return result
+
+
+def create_matchup_views(matchups, type_names, make_url):
+    """
+    Creates the records of a set of type matchups, with each type's name,
+    url, and multiplier label resolved.
+    """
+    return {
+        group: [
+            {
+                "id": item["type"],
+                "name": type_names[item["type"]],
+                "url": make_url("types/%s.html" % item["type"]),
+                "multiplier": "%g×" % item["multiplier"],
+            }
+            for item in items
+        ]
+        for group, items in matchups.items()
+    }
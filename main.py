@@ -1,14 +1,21 @@
 import argparse
 import os
 import re
+import sys
 
 from jinja2 import Environment, FileSystemLoader, select_autoescape
 
-from setup.core_data import load_core_data
+from setup.core_data import load_core_data, resolve_entity_ids
 from setup.core_funcs import load_core_funcs
 from settings import load_project_settings
+from util.asset_manifest import AssetManifest
+from util.fragment_cache import FragmentCacheExtension
+from postprocess import build_profiles, postprocess_dist
+from preview_server import PreviewServer
+from watch import IncrementalBuilder
 from generators import (
     AbilitiesGenerator,
+    ApiGenerator,
     IndexGenerator,
     MapSectionsGenerator,
     MapsGenerator,
@@ -16,13 +23,80 @@ from generators import (
     MonSummariesGenerator,
     MovesGenerator,
     PokedexGenerator,
+    SearchGenerator,
     TypesGenerator,
 )
 
 
+# All of the artifact generators, in the order they are executed
+# to build the static website.
+artifact_generators = [
+    MonPicsGenerator,
+    IndexGenerator,
+    PokedexGenerator,
+    MonSummariesGenerator,
+    TypesGenerator,
+    AbilitiesGenerator,
+    MovesGenerator,
+    MapSectionsGenerator,
+    MapsGenerator,
+    ApiGenerator,
+    SearchGenerator,
+]
+
+# Entity kinds that can be selected from the command line.
+entity_filter_kinds = [
+    "species",
+    "moves",
+    "types",
+    "abilities",
+    "maps",
+    "map_sections",
+]
+
+
+def split_arg_list(value):
+    """
+    Splits a comma-separated command line option into a list.
+    """
+    return [item.strip() for item in value.split(",") if item.strip()]
+
+
+def select_generators(argparser, only):
+    """
+    Returns the artifact generators that were selected from the command
+    line. All generators are selected if none were specified.
+    """
+    if only is None:
+        return artifact_generators
+
+    generators_by_name = {generator.name: generator for generator in artifact_generators}
+    names = split_arg_list(only)
+    for name in names:
+        if name not in generators_by_name:
+            argparser.error("unknown generator '%s' (choose from %s)" % (name, ", ".join(generators_by_name)))
+
+    return [generator for generator in artifact_generators if generator.name in names]
+
+
 if __name__ == "__main__":
     argparser = argparse.ArgumentParser("Linoone - Decomp Website Builder")
     argparser.add_argument("project_dir", help="directory of the decomp project")
+    argparser.add_argument("--only", help="comma-separated list of generators to run (e.g. moves,mon_summaries)")
+    argparser.add_argument("--species", help="comma-separated list of species to generate (e.g. SPECIES_TREECKO)")
+    argparser.add_argument("--moves", help="comma-separated list of moves to generate (e.g. MOVE_TACKLE)")
+    argparser.add_argument("--types", help="comma-separated list of types to generate (e.g. TYPE_FIRE)")
+    argparser.add_argument("--abilities", help="comma-separated list of abilities to generate (e.g. ABILITY_BLAZE)")
+    argparser.add_argument("--maps", help="comma-separated list of maps to generate (e.g. MAP_ROUTE101)")
+    argparser.add_argument("--map-sections", help="comma-separated list of region map sections to generate (e.g. MAPSEC_ROUTE_101)")
+    argparser.add_argument("-j", "--jobs", type=int, help="number of worker processes to use (default: number of CPUs)")
+    argparser.add_argument("--profile-mode", choices=list(build_profiles), default="release", help="build profile: dev skips optimization, release optimizes, minifies, and precompresses the output (default: release)")
+    argparser.add_argument("--hash-assets", action="store_true", help="link to content-hashed copies of the generated assets, so they can be cached indefinitely")
+    argparser.add_argument("--relative-urls", action="store_true", help="link pages and assets with urls relative to each page, instead of absolute urls")
+    argparser.add_argument("--evolution-layout", choices=["native", "graphviz"], default="native", help="how to lay out evolution charts: native is built in, graphviz requires Graphviz (default: native)")
+    argparser.add_argument("--watch", action="store_true", help="keep running and rebuild when the project or templates change")
+    argparser.add_argument("--serve", action="store_true", help="serve a preview of the website that renders pages on demand")
+    argparser.add_argument("--port", type=int, default=8000, help="port for the preview server (default: 8000)")
     args = argparser.parse_args()
 
     # Load program config.
@@ -30,31 +104,56 @@ if __name__ == "__main__":
     config["project_dir"] = args.project_dir
     config["website_title"] = "pokeemerald"
     config["dist_dir"] = os.path.join(os.path.dirname(os.path.realpath(__file__)), "dist")
+    config["cache_dir"] = os.path.join(os.path.dirname(os.path.realpath(__file__)), "build_cache")
     config["base_url"] = None
+    if args.serve:
+        config["base_url"] = "http://localhost:%d/" % args.port
+    config["jobs"] = args.jobs
+    config["profile_mode"] = args.profile_mode
+    config["relative_urls"] = args.relative_urls
+    config["evolution_layout"] = args.evolution_layout
+    config["asset_manifest"] = None
+    if args.hash_assets:
+        config["asset_manifest"] = AssetManifest(config["dist_dir"])
+    config["entity_filters"] = {}
+    for kind in entity_filter_kinds:
+        value = getattr(args, kind)
+        if value is not None:
+            config["entity_filters"][kind] = resolve_entity_ids(config, kind, split_arg_list(value))
+
+    # Only load the core data that is needed by the selected generators.
+    selected_generators = select_generators(argparser, args.only)
+    required_data = set()
+    for generator in selected_generators:
+        required_data.update(generator.required_data)
 
     # Load core data and functions to be used by generators and their templates.
-    core_data = load_core_data(config)
+    core_data = load_core_data(config, required_data)
     core_funcs = load_core_funcs(config)
     project_settings = load_project_settings(config)
 
     # Create Jinja templating environment
+    templates_dir = "templates"
     env = Environment(
-        loader=FileSystemLoader("templates"),
-        autoescape=select_autoescape(["html"])
+        loader=FileSystemLoader(templates_dir),
+        autoescape=select_autoescape(["html"]),
+        extensions=[FragmentCacheExtension]
     )
 
-    # Execute all of the artifact generators to build the static website.
-    artifact_generators = [
-        MonPicsGenerator,
-        IndexGenerator,
-        PokedexGenerator,
-        MonSummariesGenerator,
-        TypesGenerator,
-        AbilitiesGenerator,
-        MovesGenerator,
-        MapSectionsGenerator,
-        MapsGenerator,
-    ]
-    for generator in artifact_generators:
-        g = generator(config, core_data, core_funcs, project_settings)
+    # Execute the selected artifact generators to build the static website.
+    generators = [generator(config, core_data, core_funcs, project_settings) for generator in selected_generators]
+    if args.serve:
+        PreviewServer(config, env, generators).serve("localhost", args.port)
+        sys.exit(0)
+
+    for g in generators:
         g.run(env)
+
+    postprocess_dist(config)
+
+    if args.watch:
+        builder = IncrementalBuilder(config, env, core_data, generators, templates_dir)
+        try:
+            builder.watch()
+        except KeyboardInterrupt:
+            pass
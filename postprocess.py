@@ -0,0 +1,257 @@
+#--------------------------------------------------------------------
+# linoone: postprocess.py
+#
+# Post-processing stage that optimizes the files in the distribution
+# directory after the generators have written them.
+#--------------------------------------------------------------------
+import gzip
+import io
+import os
+import shutil
+import subprocess
+from concurrent.futures import ProcessPoolExecutor
+
+from util.build_cache import BuildCache, hash_file, hash_values
+from util.minify import minify_css, minify_html, minify_svg
+
+from PIL import Image
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+# The post-processing steps that are run for each build profile. The dev
+# profile keeps builds fast while iterating, and the release profile
+# produces the smallest output.
+build_profiles = {
+    "dev": {
+        "optimize_images": False,
+        "minify": False,
+        "precompress": False,
+    },
+    "release": {
+        "optimize_images": True,
+        "minify": True,
+        "precompress": True,
+    },
+}
+
+# Minifier for each type of text file.
+minifiers = {
+    ".html": minify_html,
+    ".css": minify_css,
+    ".svg": minify_svg,
+}
+
+# Types of files that are precompressed for static hosts that can serve
+# the precompressed files directly.
+compressible_extensions = [".html", ".css", ".js", ".json", ".svg"]
+
+# Extensions of the precompressed files that are written next to the
+# original files. Brotli files are only written when the brotli package
+# is installed.
+precompressed_extensions = [".gz", ".br"]
+
+
+def postprocess_dist(config):
+    """
+    Runs the post-processing steps of the configured build profile over
+    the files in the distribution directory. Files that haven't changed
+    since they were last post-processed are skipped. The other files are
+    each processed as a separate job in a pool of worker processes.
+    """
+    profile = build_profiles[config.get("profile_mode", "release")]
+    dist_dir = config["dist_dir"]
+    cache = BuildCache(os.path.join(config["cache_dir"], "postprocess.json"))
+    filepaths = []
+    precompressed_filepaths = set()
+    for dirpath, dirs, files in os.walk(dist_dir):
+        for filename in files:
+            filepath = os.path.join(dirpath, filename)
+            root, extension = os.path.splitext(filepath)
+            if extension not in precompressed_extensions:
+                filepaths.append(filepath)
+            elif not profile["precompress"] or not os.path.exists(root):
+                # Precompressed files would be stale once their original
+                # files change, so they're only kept when they are
+                # rewritten along with them.
+                os.remove(filepath)
+            else:
+                precompressed_filepaths.add(filepath)
+
+    if not any(profile.values()):
+        cache.retain([])
+        cache.save()
+        return
+
+    # Processed copies of the files, which are restored when a generator
+    # rewrites a file with the same content as before it was processed.
+    output_dir = os.path.join(config["cache_dir"], "postprocess")
+    os.makedirs(output_dir, exist_ok=True)
+
+    # Assets that have hashed copies are only referenced through their
+    # copies, so only the copies are processed. Processing the assets
+    # would change their content, and therefore the names of their copies.
+    asset_manifest = config.get("asset_manifest")
+    hashed_assets = set(asset_manifest.entries) if asset_manifest is not None else set()
+
+    jobs = []
+    for filepath in filepaths:
+        key = os.path.relpath(filepath, dist_dir).replace(os.sep, "/")
+        if key in hashed_assets:
+            continue
+
+        jobs.append({
+            "key": key,
+            "filepath": filepath,
+            "profile": profile,
+            "entry": cache.entries.get(key) if isinstance(cache.entries.get(key), dict) else None,
+            "output_dir": output_dir,
+            "precompressed_extensions": [e for e in precompressed_extensions if filepath + e in precompressed_filepaths],
+        })
+
+    num_processed = 0
+    if len(jobs) > 0:
+        with ProcessPoolExecutor(max_workers=config.get("jobs")) as executor:
+            for job, (entry, processed, messages) in zip(jobs, executor.map(process_dist_file, jobs, chunksize=32)):
+                for message in messages:
+                    print(message)
+                cache.set(job["key"], entry)
+                if processed:
+                    num_processed += 1
+
+    if num_processed > 0:
+        print("Post-processed %d of %d files" % (num_processed, len(jobs)))
+
+    cache.retain(job["key"] for job in jobs)
+    cache.save()
+
+    # Remove the processed copies that no longer belong to any file.
+    output_copies = set(entry["copy"] for entry in cache.entries.values() if entry is not None and entry["copy"] is not None)
+    for filename in os.listdir(output_dir):
+        if filename not in output_copies:
+            os.remove(os.path.join(output_dir, filename))
+
+
+def process_dist_file(job):
+    """
+    Runs the post-processing steps on a single file. Returns the file's
+    cache entry, whether or not it was processed, and a list of messages
+    about steps that failed. The entry has the digests of the file before
+    and after it was processed, and the name of its processed copy. The
+    file is skipped if it's still the processed output, and its processed
+    copy is restored if it was rewritten with the same content as before
+    it was processed. Either way, its precompressed files must be the
+    same as when it was processed.
+    """
+    messages = []
+    filepath = job["filepath"]
+    profile = job["profile"]
+    entry = job["entry"]
+    extension = os.path.splitext(filepath)[1].lower()
+    file_hash = hash_file(filepath)
+    digest = hash_values(file_hash, profile)
+    if entry is not None and entry["precompressed_extensions"] == job["precompressed_extensions"]:
+        if digest == entry["output"]:
+            return entry, False, messages
+
+        if digest == entry["source"] and entry["copy"] is not None:
+            copy_filepath = os.path.join(job["output_dir"], entry["copy"])
+            if os.path.isfile(copy_filepath):
+                shutil.copyfile(copy_filepath, filepath)
+                return entry, False, messages
+
+    written_extensions = []
+    try:
+        if profile["optimize_images"] and extension == ".png":
+            optimize_png(filepath)
+
+        if profile["minify"] and extension in minifiers:
+            with open(filepath, "r", encoding="utf-8") as f:
+                content = f.read()
+            minified = minifiers[extension](content)
+            if minified != content:
+                with open(filepath, "w", encoding="utf-8") as f:
+                    f.write(minified)
+
+        if profile["precompress"] and extension in compressible_extensions:
+            written_extensions = precompress_file(filepath)
+    except (OSError, ValueError, subprocess.CalledProcessError) as e:
+        messages.append("Failed to post-process %s: %s" % (filepath, e))
+        return None, True, messages
+
+    # Only files that were changed by processing need a copy. Copies are
+    # named by their content, and written under a temporary name first,
+    # since files with the same output share a copy.
+    output_hash = hash_file(filepath)
+    copy = None
+    if output_hash != file_hash:
+        copy = output_hash
+        copy_filepath = os.path.join(job["output_dir"], copy)
+        if not os.path.isfile(copy_filepath):
+            temp_filepath = "%s.%d.tmp" % (copy_filepath, os.getpid())
+            shutil.copyfile(filepath, temp_filepath)
+            os.replace(temp_filepath, copy_filepath)
+
+    entry = {
+        "source": digest,
+        "output": hash_values(output_hash, profile),
+        "copy": copy,
+        "precompressed_extensions": written_extensions,
+    }
+    return entry, True, messages
+
+
+def optimize_png(filepath):
+    """
+    Losslessly recompresses a PNG file. Uses oxipng when it's installed,
+    since it compresses much better than Pillow's encoder.
+    """
+    oxipng = shutil.which("oxipng")
+    if oxipng is not None:
+        subprocess.run([oxipng, "--quiet", "--opt", "4", "--strip", "safe", filepath], check=True)
+        return
+
+    with open(filepath, "rb") as f:
+        original = f.read()
+
+    img = Image.open(io.BytesIO(original))
+    options = {}
+    if "transparency" in img.info:
+        options["transparency"] = img.info["transparency"]
+
+    output = io.BytesIO()
+    img.save(output, "PNG", optimize=True, **options)
+    if output.tell() < len(original):
+        with open(filepath, "wb") as f:
+            f.write(output.getvalue())
+
+
+def precompress_file(filepath):
+    """
+    Writes the gzipped and brotli-compressed files next to the original
+    file. Each compressed file is only written if it's smaller than the
+    original file. Returns the extensions of the files that were written.
+    """
+    with open(filepath, "rb") as f:
+        content = f.read()
+
+    # A fixed mtime keeps the gzipped output the same across builds.
+    compressed_files = {".gz": gzip.compress(content, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        compressed_files[".br"] = brotli.compress(content, mode=brotli.MODE_TEXT, quality=11)
+
+    written_extensions = []
+    for extension in precompressed_extensions:
+        compressed_filepath = filepath + extension
+        compressed = compressed_files.get(extension)
+        if compressed is not None and len(compressed) < len(content):
+            with open(compressed_filepath, "wb") as f:
+                f.write(compressed)
+            written_extensions.append(extension)
+        elif os.path.exists(compressed_filepath):
+            os.remove(compressed_filepath)
+
+    return written_extensions
@@ -0,0 +1,168 @@
+#--------------------------------------------------------------------
+# linoone: preview_server.py
+#
+# Local HTTP server that renders the website's pages on demand,
+# instead of prerendering the entire distribution directory.
+#--------------------------------------------------------------------
+import mimetypes
+import os
+import posixpath
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+from util.lru_cache import LRUCache
+
+
+class PreviewServer:
+    """
+    Maps request paths back to the generators and entities that produce
+    them. Pages are rendered lazily and kept in a bounded cache. Generated
+    assets, such as images, are served from the distribution directory
+    and are also kept in a bounded cache.
+    """
+    def __init__(self, config, env, generators, page_cache_size=256, asset_cache_size=1024):
+        self.config = config
+        self.env = env
+        self.generators = generators
+        self.pages = LRUCache(page_cache_size)
+        self.assets = LRUCache(asset_cache_size)
+        self.prepared_generators = set()
+        self.generated_asset_dirs = set()
+
+        # Generators only prepare their template data when one of their
+        # pages is requested, so this is just a cheap listing of the pages.
+        self.routes = {}
+        for generator in generators:
+            for template_name, dest_filepath, extra_data in generator.get_pages():
+                self.routes[dest_filepath.replace(os.sep, "/")] = (generator, template_name, extra_data)
+
+
+    def get(self, path):
+        """
+        Returns the content of the given distribution path, or None if
+        nothing produces it.
+        """
+        # Only absolute request paths can be mapped to the distribution
+        # directory. Normalizing them resolves any ".." within the root.
+        if not path.startswith("/"):
+            return None
+
+        path = posixpath.normpath(urllib.parse.unquote(path)).lstrip("/")
+        if path in ("", "."):
+            path = "index.html"
+
+        if path in self.routes:
+            return self.get_page(path)
+
+        return self.get_asset(path)
+
+
+    def get_page(self, path):
+        """
+        Renders the page, or returns it from the cache if it was
+        recently rendered.
+        """
+        content = self.pages.get(path)
+        if content is None:
+            generator, template_name, extra_data = self.routes[path]
+            self.prepare_generator(generator)
+            content = generator.render_page(self.env, template_name, extra_data, path).encode("utf-8")
+            self.pages.put(path, content)
+
+        return content
+
+
+    def get_asset(self, path):
+        """
+        Returns the generated asset, generating it first if needed.
+        """
+        content = self.assets.get(path)
+        if content is not None:
+            return content
+
+        # Never serve files outside of the distribution directory, such as
+        # through encoded ".." segments or symbolic links.
+        dist_dir = os.path.realpath(self.config["dist_dir"])
+        filepath = os.path.realpath(os.path.join(dist_dir, path))
+        if os.path.commonpath([filepath, dist_dir]) != dist_dir:
+            return None
+
+        if not os.path.isfile(filepath):
+            self.generate_assets(os.path.dirname(path))
+            if not os.path.isfile(filepath):
+                return None
+
+        with open(filepath, "rb") as f:
+            content = f.read()
+
+        self.assets.put(path, content)
+        return content
+
+
+    def prepare_generator(self, generator):
+        """
+        Prepares the generator's template data, if it hasn't been done yet.
+        """
+        if generator in self.prepared_generators:
+            return
+
+        for asset_dir in generator.required_asset_dirs:
+            self.generate_assets(asset_dir)
+
+        generator.custom_data.update(generator.prepare_template_data())
+        self.prepared_generators.add(generator)
+
+
+    def generate_assets(self, asset_dir):
+        """
+        Runs the generators that produce assets into the given
+        distribution subdirectory, if they haven't been run yet.
+        """
+        if asset_dir in self.generated_asset_dirs:
+            return
+
+        for generator in self.generators:
+            if asset_dir in generator.asset_dirs:
+                generator.generate_assets()
+                generator.update_asset_manifest()
+                self.generated_asset_dirs.update(generator.asset_dirs)
+
+        self.generated_asset_dirs.add(asset_dir)
+
+
+    def serve(self, host, port):
+        """
+        Serves the website until interrupted.
+        """
+        server = HTTPServer((host, port), create_request_handler(self))
+        print("Serving preview at http://%s:%d/. Press Ctrl+C to stop." % (host, port))
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+
+
+def create_request_handler(preview_server):
+    """
+    Creates the HTTP request handler class for the preview server.
+    """
+    class PreviewRequestHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            path = urllib.parse.urlsplit(self.path).path
+            content = preview_server.get(path)
+            if content is None:
+                self.send_error(404)
+                return
+
+            content_type = mimetypes.guess_type(path)[0] or "text/html"
+            if content_type == "text/html":
+                content_type += "; charset=utf-8"
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(content)))
+            self.end_headers()
+            self.wfile.write(content)
+
+    return PreviewRequestHandler
@@ -1,4 +1,5 @@
 from .evolution_methods import evolution_methods
+from .region_map import region_map
 from .types import types
 
 def load_project_settings(config):
@@ -9,5 +10,6 @@ def load_project_settings(config):
     """
     return {
         "evolution_methods": evolution_methods,
+        "region_map": region_map,
         "types": types,
     }
@@ -0,0 +1,28 @@
+#--------------------------------------------------------------------
+# linoone: region_map.py
+#
+# Project settings for the region map.
+#--------------------------------------------------------------------
+
+# Region map metadata settings that can't be automatically
+# determined from source files inspection.
+class RegionMapSettings:
+    def __init__(self):
+        self.tiles_filepath = "graphics/pokenav/region_map/map.png"
+        self.tilemap_filepath = "graphics/pokenav/region_map/map.bin"
+        # The vanilla region map is an 8bpp affine background, whose tilemap
+        # has 8-bit entries. Text-mode backgrounds have 16-bit entries with
+        # flip and palette bits.
+        self.bpp = 8
+        self.affine = True
+        # Width of the tilemap, in tiles, and the region of it that
+        # is displayed on screen.
+        self.tilemap_width = 64
+        self.visible_width = 30
+        self.visible_height = 20
+        # Optional JASC palette file to use instead of the palette of
+        # the tiles image. 4bpp maps with multiple palettes need this.
+        self.palette_filepath = None
+
+
+region_map = RegionMapSettings()
@@ -9,7 +9,7 @@ import os
 import pickle
 import re
 
-from pycparser.c_ast import BinaryOp, Cast, Constant, FuncCall, ID, InitList, NamedInitializer
+from pycparser.c_ast import BinaryOp, Cast, Constant, Decl, FuncCall, ID, InitList, NamedInitializer, Struct, TypeDecl
 from .parse_code import parse_declaration_from_file, parse_ast_from_file, get_declaration_from_ast, parse_names
 
 
@@ -294,6 +294,54 @@ def parse_type_names(config):
     return parse_names(filepath, "gTypeNames", config["project_dir"])
 
 
+# Markers in the type effectiveness table. Entries after the foresight
+# marker are ignored by Foresight, and the table ends at the end marker.
+TYPE_FORESIGHT = 0xFE
+TYPE_ENDTABLE = 0xFF
+
+
+def parse_type_effectiveness(config):
+    """
+    Parses and returns the project's type effectiveness table. Each entry
+    has the attacking type, the defending type, and the damage multiplier
+    in tenths (e.g. 20 is super effective). Type pairs that aren't in the
+    table deal normal damage.
+    """
+    filepath = os.path.join(config["project_dir"], "src/battle_main.c")
+    type_effectiveness = parse_declaration_from_file(filepath, "gTypeEffectiveness", config["project_dir"])
+    if type_effectiveness == None:
+        raise Exception("Failed to read type effectiveness from %s" % filepath)
+
+    values = [expr.value if type(expr) == Constant else expr.name for expr in type_effectiveness.init.exprs]
+    result = []
+    for i in range(0, len(values) - 2, 3):
+        attacker, defender, multiplier = values[i:i + 3]
+        marker = get_constant_int(attacker)
+        if marker == TYPE_ENDTABLE:
+            break
+        if marker == TYPE_FORESIGHT:
+            continue
+
+        result.append({
+            "attacker": attacker,
+            "defender": defender,
+            "multiplier": get_constant_int(multiplier),
+        })
+
+    return result
+
+
+def get_constant_int(value):
+    """
+    Returns the integer value of a C integer constant, such as "0x0A", or
+    None if it isn't one.
+    """
+    try:
+        return int(value.rstrip("uUlL"), 0 if re.match(r"0[xX]", value) else 10)
+    except ValueError:
+        return None
+
+
 def parse_ability_names(config):
     """
     Parses and returns the project's mon ability names.
@@ -592,6 +640,80 @@ def parse_maps(config):
     return maps
 
 
+def parse_map_layouts(config):
+    """
+    Parses and returns the project's map layouts, which hold the
+    dimensions, tilesets, and blockdata of the maps.
+    """
+    filepath = os.path.join(config["project_dir"], "data/layouts/layouts.json")
+    with open(filepath, encoding="utf-8") as f:
+        layouts_data = json.load(f)
+
+    result = {}
+    for layout in layouts_data["layouts"]:
+        # Unused layout slots are empty objects.
+        if "id" not in layout:
+            continue
+
+        result[layout["id"]] = {
+            'width': int(layout["width"]),
+            'height': int(layout["height"]),
+            'primary_tileset': layout["primary_tileset"],
+            'secondary_tileset': layout["secondary_tileset"],
+            'blockdata_filepath': os.path.join(config["project_dir"], layout["blockdata_filepath"]),
+        }
+
+    return result
+
+
+def parse_tilesets(config):
+    """
+    Parses and returns the project's map tilesets. Each tileset has the
+    filepaths of its source tiles image, palettes, and metatiles.
+    """
+    filepath = os.path.join(config["project_dir"], "src/tilesets.c")
+    ast = parse_ast_from_file(filepath, config["project_dir"])
+
+    def get_incbin_filepaths(label):
+        decl = get_declaration_from_ast(ast, label)
+        if decl == None or decl.init == None:
+            return []
+
+        calls = decl.init.exprs if type(decl.init) == InitList else [decl.init]
+        return [
+            os.path.join(config["project_dir"], call.args.exprs[0].value.strip("\""))
+            for call in calls if type(call) == FuncCall
+        ]
+
+    result = {}
+    for item in ast.ext:
+        if type(item) != Decl or type(item.type) != TypeDecl or type(item.init) != InitList:
+            continue
+        if type(item.type.type) != Struct or item.type.type.name != "Tileset":
+            continue
+
+        fields = {}
+        for field in item.init.exprs:
+            if type(field) == NamedInitializer:
+                fields[field.name[0].name] = field.expr
+
+        is_secondary = fields.get("isSecondary")
+        tiles = fields.get("tiles")
+        palettes = fields.get("palettes")
+        metatiles = fields.get("metatiles")
+        tiles_filepaths = get_incbin_filepaths(tiles.name) if type(tiles) == ID else []
+        metatiles_filepaths = get_incbin_filepaths(metatiles.name) if type(metatiles) == ID else []
+        result[item.name] = {
+            'is_secondary': (type(is_secondary) == Constant and is_secondary.value != "0") or
+                            (type(is_secondary) == ID and is_secondary.name == "TRUE"),
+            'tiles_filepath': re.sub(r"\.[48]bpp.*", ".png", tiles_filepaths[0]) if tiles_filepaths else None,
+            'palette_filepaths': [re.sub(r"\.gbapal.*", ".pal", f) for f in get_incbin_filepaths(palettes.name)] if type(palettes) == ID else [],
+            'metatiles_filepath': metatiles_filepaths[0] if metatiles_filepaths else None,
+        }
+
+    return result
+
+
 def parse_region_map_sections(config):
     """
     Parses and returns the project's region map entries.
@@ -636,7 +758,7 @@ def parse_defines(config, filepath, prefix=None):
             match = re.match(r"#define\s+(\w+)\s+(.+)", line)
             if match:
                 name = match.group(1)
-                value = match.group(2)
+                value = match.group(2).split("//")[0].strip()
                 if prefix is None or name.startswith(prefix):
                     result[value] = name
 
@@ -656,6 +778,19 @@ def parse_species_defines(config):
     return species_to_id, id_to_species
 
 
+def parse_constant_names(config):
+    """
+    Parses the constant names of the entities that are keyed by their ids
+    in the core data, such as SPECIES_TREECKO. Returns a dict mapping each
+    kind of entity to a dict mapping ids to constant names.
+    """
+    result = {}
+    for kind, (filepath, prefix) in constant_defines.items():
+        result[kind] = parse_defines(config, filepath, prefix)
+
+    return result
+
+
 def parse_wild_mons(config):
     """
     Parses and returns the wild Pokémon definitions in the project.
@@ -690,114 +825,168 @@ def parse_type_icon_palette_slots(config):
     return result
 
 
+# Datasets that make up the core data. Each dataset is parsed by its
+# func and cached into its cache_file. Datasets that return multiple
+# values list the core data keys they provide. The sources are the
+# project files (or directories) the dataset is read from.
 project_data = {
     "mon_base_stats": {
         "func": parse_base_stats,
-        "cache_file": "mon_base_stats.pickle"
+        "cache_file": "mon_base_stats.pickle",
+        "sources": ["src/pokemon.c"]
     },
     "mon_dex_enums": {
         "func": parse_dex_enums,
-        "cache_file": "mon_dex_enums.pickle"
+        "cache_file": "mon_dex_enums.pickle",
+        "sources": ["include/constants/pokedex.h"]
     },
     "mon_dex_entries": {
         "func": parse_dex_entries,
-        "cache_file": "mon_dex_entries.pickle"
+        "cache_file": "mon_dex_entries.pickle",
+        "sources": ["src/pokedex.c", "include/constants/pokedex.h"]
     },
     "mon_learnsets": {
         "func": parse_levelup_learnsets,
-        "cache_file": "mon_learnsets.pickle"
+        "cache_file": "mon_learnsets.pickle",
+        "sources": ["src/pokemon.c"]
     },
     "mon_tmhm_learnsets": {
         "func": parse_tmhm_learnsets,
-        "cache_file": "mon_tmhm_learnsets.pickle"
+        "cache_file": "mon_tmhm_learnsets.pickle",
+        "sources": ["src/pokemon.c"]
     },
     "mon_egg_moves": {
         "func": parse_egg_moves,
-        "cache_file": "mon_egg_moves.pickle"
+        "cache_file": "mon_egg_moves.pickle",
+        "sources": ["src/daycare.c"]
     },
     "mon_tutor_moves": {
         "func": parse_tutor_moves,
-        "cache_file": "mon_tutor_moves.pickle"
+        "cache_file": "mon_tutor_moves.pickle",
+        "sources": ["src/party_menu.c"]
     },
     "mon_species_names": {
         "func": parse_species_names,
-        "cache_file": "mon_species_names.pickle"
+        "cache_file": "mon_species_names.pickle",
+        "sources": ["src/data.c"]
     },
     "mon_evolutions": {
         "func": parse_evolutions,
-        "cache_file": "mon_evolutions.pickle"
+        "cache_file": "mon_evolutions.pickle",
+        "sources": ["src/pokemon.c"]
     },
     "species_maps": {
         "func": parse_species_mapping,
-        "cache_file": "species_maps.pickle"
+        "cache_file": "species_maps.pickle",
+        "keys": ["species_to_national", "national_to_species"],
+        "sources": ["src/pokemon.c", "include/constants/pokedex.h"]
     },
     "tmhm_maps": {
         "func": parse_tmhm_mapping,
-        "cache_file": "tmhm_maps.pickle"
+        "cache_file": "tmhm_maps.pickle",
+        "keys": ["item_to_move", "move_to_item"],
+        "sources": ["src/party_menu.c"]
     },
     "mon_front_pics": {
         "func": parse_mon_front_pics,
-        "cache_file": "mon_front_pics.pickle"
+        "cache_file": "mon_front_pics.pickle",
+        "sources": ["src/data.c", "src/anim_mon_front_pics.c"]
     },
     "mon_back_pics": {
         "func": parse_mon_back_pics,
-        "cache_file": "mon_back_pics.pickle"
+        "cache_file": "mon_back_pics.pickle",
+        "sources": ["src/data.c", "src/graphics.c"]
     },
     "mon_icon_pics": {
         "func": parse_mon_icon_pics,
-        "cache_file": "mon_icon_pics.pickle"
+        "cache_file": "mon_icon_pics.pickle",
+        "sources": ["src/pokemon_icon.c", "src/graphics.c"]
     },
     "mon_shiny_palettes": {
         "func": parse_mon_shiny_palettes,
-        "cache_file": "mon_shiny_palettes.pickle"
+        "cache_file": "mon_shiny_palettes.pickle",
+        "sources": ["src/data.c", "src/graphics.c"]
     },
     "ability_names": {
         "func": parse_ability_names,
-        "cache_file": "ability_names.pickle"
+        "cache_file": "ability_names.pickle",
+        "sources": ["src/battle_main.c"]
     },
     "ability_descriptions": {
         "func": parse_ability_descriptions,
-        "cache_file": "ability_descriptions.pickle"
+        "cache_file": "ability_descriptions.pickle",
+        "sources": ["src/battle_main.c"]
     },
     "move_descriptions": {
         "func": parse_move_descriptions,
-        "cache_file": "move_descriptions.pickle"
+        "cache_file": "move_descriptions.pickle",
+        "sources": ["src/pokemon_summary_screen.c"]
     },
     "moves": {
         "func": parse_moves,
-        "cache_file": "moves.pickle"
+        "cache_file": "moves.pickle",
+        "sources": ["src/pokemon.c"]
     },
     "type_names": {
         "func": parse_type_names,
-        "cache_file": "type_names.pickle"
+        "cache_file": "type_names.pickle",
+        "sources": ["src/battle_main.c"]
+    },
+    "type_effectiveness": {
+        "func": parse_type_effectiveness,
+        "cache_file": "type_effectiveness.pickle",
+        "sources": ["src/battle_main.c"]
     },
     "move_names": {
         "func": parse_move_names,
-        "cache_file": "move_names.pickle"
+        "cache_file": "move_names.pickle",
+        "sources": ["src/data.c"]
     },
     "items": {
         "func": parse_items,
-        "cache_file": "items.pickle"
+        "cache_file": "items.pickle",
+        "sources": ["src/item.c"]
     },
     "maps": {
         "func": parse_maps,
-        "cache_file": "maps.pickle"
+        "cache_file": "maps.pickle",
+        "sources": ["data/maps"]
+    },
+    "map_layouts": {
+        "func": parse_map_layouts,
+        "cache_file": "map_layouts.pickle",
+        "sources": ["data/layouts/layouts.json"]
+    },
+    "tilesets": {
+        "func": parse_tilesets,
+        "cache_file": "tilesets.pickle",
+        "sources": ["src/tilesets.c"]
     },
     "region_map_sections": {
         "func": parse_region_map_sections,
-        "cache_file": "region_map_sections.pickle"
+        "cache_file": "region_map_sections.pickle",
+        "sources": ["src/region_map.c", "include/constants/region_map_sections.h"]
     },
     "wild_mons": {
         "func": parse_wild_mons,
-        "cache_file": "wild_mons.pickle"
+        "cache_file": "wild_mons.pickle",
+        "sources": ["src/data/wild_encounters.json"]
     },
     "species_defines": {
         "func": parse_species_defines,
-        "cache_file": "species_defines.pickle"
+        "cache_file": "species_defines.pickle",
+        "keys": ["species_to_id", "id_to_species"],
+        "sources": ["include/constants/species.h"]
+    },
+    "constant_names": {
+        "func": parse_constant_names,
+        "cache_file": "constant_names.pickle",
+        "sources": ["include/constants/species.h", "include/constants/moves.h", "include/constants/pokemon.h", "include/constants/abilities.h", "include/constants/items.h"]
     },
     "type_icon_palette_slots": {
         "func": parse_type_icon_palette_slots,
-        "cache_file": "type_icon_palette_slots.pickle"
+        "cache_file": "type_icon_palette_slots.pickle",
+        "sources": ["src/pokemon_summary_screen.c"]
     },
 }
 
@@ -816,73 +1005,68 @@ def load_data(name, config, force=False):
         except:
             pass
 
-    f = open(project_data[name]["cache_file"], "wb")
     d = project_data[name]["func"](config)
-    pickle.dump(d, f)
+    with open(project_data[name]["cache_file"], "wb") as f:
+        pickle.dump(d, f)
     return d
 
 
-def load_core_data(config):
+def get_dataset_keys(name):
+    """
+    Returns the core data keys provided by the given dataset.
+    """
+    return project_data[name].get("keys", [name])
+
+
+def load_core_data(config, keys=None):
     """
     Loads the core data from the decomp source files, which are made
-    available to the page generator templates.
-    """
-    mon_base_stats = load_data("mon_base_stats", config)
-    mon_dex_enums = load_data("mon_dex_enums", config)
-    mon_dex_entries = load_data("mon_dex_entries", config)
-    mon_learnsets = load_data("mon_learnsets", config)
-    mon_tmhm_learnsets = load_data("mon_tmhm_learnsets", config)
-    mon_egg_moves = load_data("mon_egg_moves", config)
-    mon_tutor_moves = load_data("mon_tutor_moves", config)
-    mon_species_names = load_data("mon_species_names", config)
-    mon_evolutions = load_data("mon_evolutions", config)
-    species_to_national, national_to_species = load_data("species_maps", config)
-    item_to_move, move_to_item = load_data("tmhm_maps", config)
-    mon_front_pics = load_data("mon_front_pics", config)
-    mon_back_pics = load_data("mon_back_pics", config)
-    mon_icon_pics = load_data("mon_icon_pics", config)
-    mon_shiny_palettes = load_data("mon_shiny_palettes", config)
-    ability_names = load_data("ability_names", config)
-    ability_descriptions = load_data("ability_descriptions", config)
-    move_descriptions = load_data("move_descriptions", config)
-    moves = load_data("moves", config)
-    type_names = load_data("type_names", config)
-    move_names = load_data("move_names", config)
-    items = load_data("items", config)
-    maps = load_data("maps", config)
-    region_map_sections = load_data("region_map_sections", config)
-    wild_mons = load_data("wild_mons", config)
-    species_to_id, id_to_species = load_data("species_defines", config)
-    type_icon_palette_slots = load_data("type_icon_palette_slots", config)
-    return {
-        "mon_base_stats": mon_base_stats,
-        "mon_dex_enums": mon_dex_enums,
-        "mon_dex_entries": mon_dex_entries,
-        "mon_learnsets": mon_learnsets,
-        "mon_tmhm_learnsets": mon_tmhm_learnsets,
-        "mon_egg_moves": mon_egg_moves,
-        "mon_tutor_moves": mon_tutor_moves,
-        "mon_species_names": mon_species_names,
-        "mon_evolutions": mon_evolutions,
-        "species_to_national": species_to_national,
-        "national_to_species": national_to_species,
-        "item_to_move": item_to_move,
-        "move_to_item": move_to_item,
-        "mon_front_pics": mon_front_pics,
-        "mon_back_pics": mon_back_pics,
-        "mon_icon_pics": mon_icon_pics,
-        "mon_shiny_palettes": mon_shiny_palettes,
-        "ability_names": ability_names,
-        "ability_descriptions": ability_descriptions,
-        "move_descriptions": move_descriptions,
-        "moves": moves,
-        "type_names": type_names,
-        "move_names": move_names,
-        "items": items,
-        "maps": maps,
-        "region_map_sections": region_map_sections,
-        "wild_mons": wild_mons,
-        "species_to_id": species_to_id,
-        "id_to_species": id_to_species,
-        "type_icon_palette_slots": type_icon_palette_slots,
-    }
+    available to the page generator templates. If keys is provided,
+    only the datasets that provide those core data keys are loaded.
+    """
+    core_data = {}
+    for name in project_data:
+        data_keys = get_dataset_keys(name)
+        if keys is not None and not any(key in keys for key in data_keys):
+            continue
+
+        d = load_data(name, config)
+        if len(data_keys) == 1:
+            core_data[name] = d
+        else:
+            core_data.update(zip(data_keys, d))
+
+    return core_data
+
+
+# Maps the entity kinds that can be selected from the command line
+# to the header that defines their constant names. Entities without
+# an entry here (such as maps) are keyed by their names directly.
+entity_defines = {
+    "species": ("include/constants/species.h", "SPECIES_"),
+    "moves": ("include/constants/moves.h", "MOVE_"),
+    "types": ("include/constants/pokemon.h", "TYPE_"),
+    "abilities": ("include/constants/abilities.h", "ABILITY_"),
+}
+
+# Maps the entity kinds whose ids are mapped back to their constant names
+# (e.g. for the data API) to the header that defines them.
+constant_defines = dict(entity_defines, items=("include/constants/items.h", "ITEM_"))
+
+
+def resolve_entity_ids(config, kind, names):
+    """
+    Resolves the given entity constant names (e.g. SPECIES_TREECKO)
+    into the ids that are used as keys in the core data. Names that
+    aren't defined are assumed to already be ids.
+    """
+    if kind not in entity_defines:
+        return set(names)
+
+    filepath, prefix = entity_defines[kind]
+    defines = parse_defines(config, filepath, prefix)
+    name_to_id = {}
+    for value in defines:
+        name_to_id[defines[value]] = value
+
+    return set(name_to_id.get(name, name) for name in names)
@@ -3,29 +3,98 @@
 #
 # Builds the core functions to be used by the templating pipeline.
 #--------------------------------------------------------------------
+import functools
 import os
+import posixpath
 import urllib.parse
 
-def make_url_factory(root):
+
+class UrlResolver:
     """
-    Factory function to create a make_url() function that resolves urls.
-    The resulting function is intended to be used in the HTML templates
-    to generate urls that will function properly for both local and live
-    web scenarios.
+    Resolves the paths of pages and assets to urls. The templates resolve
+    the same few thousand paths over and over, so resolved urls are kept
+    in bounded caches. In relative mode, urls are resolved relative to the
+    page being rendered instead of being absolute.
     """
-    live_web = False
-    if root.startswith('http'):
-        live_web = True
-        if not root.endswith('/'):
-            root += '/'
-
-    def make_url(path):
-        if live_web:
-            return urllib.parse.urljoin(root, path)
+    def __init__(self, root, asset_manifest=None, relative=False, cache_size=16384):
+        self.root = root
+        self.live_web = root.startswith('http')
+        if self.live_web and not root.endswith('/'):
+            self.root += '/'
+        self.asset_manifest = asset_manifest
+        self.relative = relative
+        self.resolve = functools.lru_cache(maxsize=cache_size)(self.resolve_url)
+        self.resolve_relative = functools.lru_cache(maxsize=cache_size)(self.resolve_relative_url)
+        self.page_url_funcs = {}
+
+
+    def resolve_url(self, path):
+        """
+        Resolves the path to an absolute url. If an asset manifest is
+        provided, assets are resolved to their content-hashed copies.
+        """
+        if self.asset_manifest is not None:
+            path = self.asset_manifest.get(path)
+        if self.live_web:
+            return urllib.parse.urljoin(self.root, path)
+        else:
+            return os.path.normpath(os.path.join(self.root, path))
+
+
+    def resolve_relative_url(self, page_dir, path):
+        """
+        Resolves the path to a url that is relative to the given directory
+        of the page that links to it.
+        """
+        if self.asset_manifest is not None:
+            path = self.asset_manifest.get(path)
+        return posixpath.relpath(path, page_dir or ".")
+
+
+    def for_page(self, page_path):
+        """
+        Returns a make_url() function for the page at the given distribution
+        path. Pages in the same directory share the same function and its
+        cached urls, until the resolver is cleared.
+        """
+        page_dir = None
+        if self.relative and page_path is not None:
+            page_dir = posixpath.dirname(page_path.replace(os.sep, "/"))
+
+        make_url = self.page_url_funcs.get(page_dir)
+        if make_url is None:
+            make_url = self.create_url_func(page_dir)
+            self.page_url_funcs[page_dir] = make_url
+
+        return make_url
+
+
+    def create_url_func(self, page_dir):
+        """
+        Creates a make_url() function for pages in the given directory, or
+        for every page if urls are absolute. A new function is created each
+        time, so that anything keyed by the function, such as cached
+        template fragments, is invalidated when the resolver is cleared.
+        """
+        if page_dir is None:
+            resolve = self.resolve
+            def make_url(path):
+                return resolve(path)
         else:
-            return os.path.normpath(os.path.join(root, path))
+            resolve_relative = self.resolve_relative
+            def make_url(path):
+                return resolve_relative(page_dir, path)
+
+        return make_url
+
 
-    return make_url
+    def clear(self):
+        """
+        Forgets the resolved urls, such as when the asset manifest changed.
+        """
+        self.resolve.cache_clear()
+        self.resolve_relative.cache_clear()
+        self.page_url_funcs = {}
 
 
 def load_core_funcs(config):
@@ -36,7 +105,8 @@ def load_core_funcs(config):
     if root is None:
         root = config["dist_dir"]
 
-    make_url = make_url_factory(root)
+    url_resolver = UrlResolver(root, config.get("asset_manifest"), config.get("relative_urls", False))
     return {
-        "make_url": make_url,
-    }
\ No newline at end of file
+        "make_url": url_resolver.resolve,
+        "url_resolver": url_resolver,
+    }
@@ -27,14 +27,49 @@ def parse_ast_from_file(filepath, project_path):
     # TODO: There are some issues with the decomp code and pycparser.
     #       Had to make this modifications to decomp source code:
     #       1. In global.h, #define __attribute__(x)
-    ast = parse_file(filepath, use_cpp=True, cpp_args=[
+    ast = parse_file(filepath, use_cpp=True, cpp_args=get_cpp_args(project_path))
+    ast_cache[filepath] = ast
+    return ast
+
+
+def clear_ast_cache(filepaths):
+    """
+    Removes the given C files' abstract syntax trees from the cache, so
+    that they are parsed again the next time they are needed.
+    """
+    for filepath in filepaths:
+        ast_cache.pop(filepath, None)
+
+
+def get_cpp_args(project_path):
+    """
+    Returns the C preprocessor arguments used to parse the project's files.
+    """
+    return [
         r'-I%s' % os.path.join(project_path, "tools/agbcc/include"),
         r'-I%s' % os.path.join(project_path, "tools/agbcc"),
         r'-I%s' % os.path.join(project_path, "include"),
         r'-I%s' % os.path.join(project_path, "gflib")
-    ])
-    ast_cache[filepath] = ast
-    return ast
+    ]
+
+
+def get_file_dependencies(filepath, project_path, cpp_path='cpp'):
+    """
+    Returns the set of files the given C file depends on, including
+    itself and every file it #includes.
+    """
+    path_list = [cpp_path, '-MM'] + get_cpp_args(project_path) + [filepath]
+    try:
+        text = check_output(path_list, universal_newlines=True, encoding="utf-8")
+    except OSError as e:
+        raise RuntimeError("Unable to invoke 'cpp'.  " +
+            'Make sure its path was passed correctly\n' +
+            ('Original error: %s' % e))
+
+    # The output is a make rule, such as "pokemon.o: src/pokemon.c include/global.h \".
+    # The first item is the rule's target.
+    items = text.replace("\\\n", " ").split()[1:]
+    return set(os.path.realpath(item) for item in items)
 
 
 def get_declaration_from_ast(ast, declaration_name):
@@ -0,0 +1,134 @@
+//--------------------------------------------------------------------
+// linoone: search.js
+//
+// Queries the prebuilt search index from the search box on each page.
+// The index is written by the search generator.
+//--------------------------------------------------------------------
+(function () {
+  "use strict";
+
+  // Must match MAX_PREFIX_LENGTH in generators/search.py.
+  var MAX_PREFIX_LENGTH = 8;
+  var MAX_RESULTS = 20;
+
+  var input = document.querySelector(".site-search input");
+  var resultsList = document.querySelector(".site-search-results");
+  if (!input || !resultsList) {
+    return;
+  }
+
+  // The index files are next to docs.json, and the pages' paths are
+  // relative to the distribution directory, which is its parent.
+  var docsUrl = new URL(input.dataset.docsUrl, document.baseURI);
+  var indexUrl = new URL(".", docsUrl);
+  var rootUrl = new URL("..", indexUrl);
+  var files = {};
+
+  function fetchJson(name, url) {
+    if (!(name in files)) {
+      files[name] = fetch(url).then(function (response) {
+        return response.ok ? response.json() : {};
+      });
+    }
+    return files[name];
+  }
+
+  function tokenize(text) {
+    return text.toLowerCase().match(/[\p{L}\p{M}\p{N}]+/gu) || [];
+  }
+
+  function getShardName(token) {
+    return /[a-z0-9]/.test(token[0]) ? token[0] : "other";
+  }
+
+  // Returns the sorted ids of the documents that have a token starting
+  // with the word.
+  function lookUp(word) {
+    var shardName = getShardName(word);
+    return fetchJson(shardName, new URL(shardName + ".json", indexUrl)).then(function (shard) {
+      return shard[word.slice(0, MAX_PREFIX_LENGTH)] || [];
+    });
+  }
+
+  function intersect(a, b) {
+    var result = [];
+    var i = 0;
+    var j = 0;
+    while (i < a.length && j < b.length) {
+      if (a[i] < b[j]) {
+        i++;
+      } else if (a[i] > b[j]) {
+        j++;
+      } else {
+        result.push(a[i]);
+        i++;
+        j++;
+      }
+    }
+    return result;
+  }
+
+  function search(query) {
+    var words = tokenize(query);
+    if (words.length === 0) {
+      return Promise.resolve([]);
+    }
+
+    var lookups = words.map(lookUp);
+    lookups.push(fetchJson("docs", docsUrl));
+    return Promise.all(lookups).then(function (results) {
+      var docs = results.pop();
+      var docIds = results.reduce(intersect);
+      var matches = docIds.map(function (docId) {
+        return docs[docId];
+      });
+
+      // Words longer than the indexed prefixes only matched by their
+      // prefix, so check them against the full tokens.
+      matches = matches.filter(function (doc) {
+        var tokens = tokenize(doc[1]);
+        return words.every(function (word) {
+          return word.length <= MAX_PREFIX_LENGTH || tokens.some(function (token) {
+            return token.startsWith(word);
+          });
+        });
+      });
+
+      // Names that start with the query come first, then shorter names.
+      var lowerQuery = query.trim().toLowerCase();
+      matches.sort(function (a, b) {
+        var aStarts = a[1].toLowerCase().startsWith(lowerQuery) ? 0 : 1;
+        var bStarts = b[1].toLowerCase().startsWith(lowerQuery) ? 0 : 1;
+        return aStarts - bStarts || a[1].length - b[1].length;
+      });
+      return matches.slice(0, MAX_RESULTS);
+    });
+  }
+
+  function showResults(matches) {
+    resultsList.textContent = "";
+    matches.forEach(function (doc) {
+      var item = document.createElement("li");
+      var name = document.createElement(doc[2] ? "a" : "span");
+      name.textContent = doc[1];
+      if (doc[2]) {
+        name.href = new URL(doc[2], rootUrl).href;
+      }
+      item.appendChild(name);
+      item.appendChild(document.createTextNode(" (" + doc[0] + ")"));
+      resultsList.appendChild(item);
+    });
+  }
+
+  var latestQuery = null;
+  input.addEventListener("input", function () {
+    var query = input.value;
+    latestQuery = query;
+    search(query).then(function (matches) {
+      // Ignore the results of queries that were typed over.
+      if (query === latestQuery) {
+        showResults(matches);
+      }
+    });
+  });
+})();
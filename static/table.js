@@ -0,0 +1,195 @@
+//--------------------------------------------------------------------
+// linoone: table.js
+//
+// Renders the listing tables from their columnar datasets, which are
+// loaded by script tags before this script. Only one page of rows is in
+// the DOM at a time, and the rows can be sorted and filtered on the
+// client.
+//--------------------------------------------------------------------
+(function () {
+  "use strict";
+
+  function link(href, child) {
+    var a = document.createElement("a");
+    a.href = href;
+    a.appendChild(child);
+    return a;
+  }
+
+  function icon(className, label) {
+    var span = document.createElement("span");
+    span.className = className;
+    span.setAttribute("role", "img");
+    span.setAttribute("aria-label", label);
+    return span;
+  }
+
+  // Renderers for the cells of each kind of column. Each one returns the
+  // cell's content for the given row of the dataset.
+  var renderers = {
+    text: function (table, column, row) {
+      return document.createTextNode(table.columns[column][row]);
+    },
+    percent: function (table, column, row) {
+      return document.createTextNode(table.columns[column][row] + "%");
+    },
+    mon_icon: function (table, column, row) {
+      var num = table.columns.national_num[row];
+      return link(table.url("pokedex/" + num + ".html"), icon("mon-icon mon-icon-" + num, table.columns.name[row]));
+    },
+    mon_link: function (table, column, row) {
+      var num = table.columns.national_num[row];
+      return link(table.url("pokedex/" + num + ".html"), document.createTextNode(table.columns.name[row]));
+    },
+    move_link: function (table, column, row) {
+      return link(table.url("moves/" + table.columns.id[row] + ".html"), document.createTextNode(table.columns.name[row]));
+    },
+    types: function (table, column, row) {
+      var fragment = document.createDocumentFragment();
+      table.columns[column][row].forEach(function (type, i) {
+        if (i > 0) {
+          fragment.appendChild(document.createTextNode(" "));
+        }
+        fragment.appendChild(link(table.url("types/" + type + ".html"), icon("type-icon type-icon-" + type, table.typeNames[type])));
+      });
+      return fragment;
+    },
+  };
+
+  function compare(a, b) {
+    if (Array.isArray(a)) {
+      a = a.join(" ");
+      b = b.join(" ");
+    }
+    if (typeof a === "number" && typeof b === "number") {
+      return a - b;
+    }
+    return String(a).localeCompare(String(b));
+  }
+
+  function DataTable(element) {
+    this.element = element;
+    this.body = element.querySelector("tbody");
+    this.status = element.querySelector(".data-table-status");
+    this.filterInput = element.querySelector(".data-table-filter");
+    this.pageSize = parseInt(element.dataset.pageSize, 10) || 50;
+    this.headers = Array.prototype.slice.call(element.querySelectorAll("th[data-column]"));
+    this.page = 0;
+    this.sortColumn = null;
+    this.sortDescending = false;
+
+    // Pages are linked relative to the distribution directory, which is
+    // the parent of the dataset's directory.
+    var dataUrl = new URL(element.dataset.tableUrl, document.baseURI);
+    this.rootUrl = new URL("..", new URL(".", dataUrl));
+
+    var data = (window.linooneTables || {})[element.dataset.table];
+    if (!data) {
+      return;
+    }
+    this.columns = data.columns;
+    this.typeNames = data.type_names || {};
+    this.rowCount = data.columns.name.length;
+    // Rows are filtered by their names and the names of their types.
+    var self = this;
+    var types = this.columns.types || [];
+    this.searchText = this.columns.name.map(function (name, i) {
+      var typeNames = (types[i] || []).map(function (type) {
+        return self.typeNames[type] || "";
+      });
+      return (name + " " + typeNames.join(" ")).toLowerCase();
+    });
+    this.bindEvents();
+    this.update();
+  }
+
+  DataTable.prototype.url = function (path) {
+    return new URL(path, this.rootUrl).href;
+  };
+
+  DataTable.prototype.bindEvents = function () {
+    var self = this;
+    this.headers.forEach(function (header) {
+      if (header.dataset.sortable === "false") {
+        return;
+      }
+      header.style.cursor = "pointer";
+      header.addEventListener("click", function () {
+        var column = header.dataset.column;
+        // Stats are most useful from highest to lowest, so their columns
+        // start out in descending order.
+        self.sortDescending = self.sortColumn === column ? !self.sortDescending : header.dataset.sortOrder === "descending";
+        self.sortColumn = column;
+        self.page = 0;
+        self.update();
+      });
+    });
+
+    if (this.filterInput) {
+      this.filterInput.addEventListener("input", function () {
+        self.page = 0;
+        self.update();
+      });
+    }
+
+    this.element.querySelectorAll("[data-page]").forEach(function (button) {
+      button.addEventListener("click", function () {
+        self.page += button.dataset.page === "next" ? 1 : -1;
+        self.render();
+      });
+    });
+  };
+
+  // Filters and sorts the rows, and then renders the current page.
+  DataTable.prototype.update = function () {
+    var query = this.filterInput ? this.filterInput.value.trim().toLowerCase() : "";
+    var rows = [];
+    for (var i = 0; i < this.rowCount; i++) {
+      if (query === "" || this.searchText[i].indexOf(query) !== -1) {
+        rows.push(i);
+      }
+    }
+
+    if (this.sortColumn !== null) {
+      var values = this.columns[this.sortColumn];
+      var direction = this.sortDescending ? -1 : 1;
+      // Ties keep the dataset's order, so sorting is stable.
+      rows.sort(function (a, b) {
+        return direction * compare(values[a], values[b]) || a - b;
+      });
+    }
+
+    this.rows = rows;
+    this.render();
+  };
+
+  DataTable.prototype.render = function () {
+    var pageCount = Math.max(1, Math.ceil(this.rows.length / this.pageSize));
+    this.page = Math.min(Math.max(this.page, 0), pageCount - 1);
+    var start = this.page * this.pageSize;
+    var end = Math.min(start + this.pageSize, this.rows.length);
+
+    var fragment = document.createDocumentFragment();
+    for (var i = start; i < end; i++) {
+      var tr = document.createElement("tr");
+      for (var j = 0; j < this.headers.length; j++) {
+        var header = this.headers[j];
+        var td = document.createElement("td");
+        var render = renderers[header.dataset.render] || renderers.text;
+        td.appendChild(render(this, header.dataset.column, this.rows[i]));
+        tr.appendChild(td);
+      }
+      fragment.appendChild(tr);
+    }
+
+    this.body.textContent = "";
+    this.body.appendChild(fragment);
+    if (this.status) {
+      this.status.textContent = this.rows.length === 0 ? "No results" : (start + 1) + "-" + end + " of " + this.rows.length;
+    }
+  };
+
+  document.querySelectorAll(".data-table").forEach(function (element) {
+    new DataTable(element);
+  });
+})();
@@ -0,0 +1,119 @@
+#--------------------------------------------------------------------
+# linoone: asset_manifest.py
+#
+# Copies generated assets to content-hashed filenames, so that they
+# can be cached indefinitely, and tracks the copies in a manifest.
+#--------------------------------------------------------------------
+import hashlib
+import json
+import os
+import posixpath
+import re
+
+# Matches the filename of a hashed copy, such as "25_front.0123456789.png".
+HASHED_FILENAME_PATTERN = re.compile(r"^(.*)\.[0-9a-f]{10}(\.[^.]+)$")
+CSS_URL_PATTERN = re.compile(r"url\(\s*(['\"]?)([^'\")]+)\1\s*\)")
+
+
+class AssetManifest:
+    """
+    Maps the distribution paths of generated assets, such as
+    "images/pokemon/25_front.png", to the paths of their content-hashed
+    copies. The manifest is stored as asset-manifest.json in the
+    distribution directory.
+    """
+    def __init__(self, dist_dir):
+        self.dist_dir = dist_dir
+        self.filepath = os.path.join(dist_dir, "asset-manifest.json")
+        self.entries = {}
+        try:
+            with open(self.filepath, "r", encoding="utf-8") as f:
+                self.entries = json.load(f)
+        except (OSError, ValueError):
+            pass
+
+
+    def get(self, path):
+        """
+        Returns the path of the asset's hashed copy, or the given path if
+        the asset doesn't have one.
+        """
+        return self.entries.get(path, path)
+
+
+    def update(self, asset_dir):
+        """
+        Writes hashed copies of the assets in the given distribution
+        subdirectory. Copies are only written when their asset's content
+        changed, and copies of older content are removed. Stylesheets are
+        handled last, so that the urls they reference can be rewritten to
+        the hashed copies.
+        """
+        dir_path = os.path.join(self.dist_dir, asset_dir)
+        try:
+            filenames = sorted(entry.name for entry in os.scandir(dir_path) if entry.is_file())
+        except OSError:
+            filenames = []
+
+        prefix = asset_dir.rstrip("/") + "/"
+        for key in list(self.entries):
+            if key.startswith(prefix) and key[len(prefix):] not in filenames:
+                del self.entries[key]
+
+        # Hashed copies and the precompressed files written next to other
+        # files (such as "icons.css.gz") aren't assets themselves.
+        all_filenames = set(filenames)
+        filenames = [
+            filename for filename in filenames
+            if not HASHED_FILENAME_PATTERN.match(filename) and os.path.splitext(filename)[0] not in all_filenames
+        ]
+        filenames.sort(key=lambda filename: filename.endswith(".css"))
+        for filename in filenames:
+            path = prefix + filename
+            with open(os.path.join(dir_path, filename), "rb") as f:
+                content = f.read()
+            if filename.endswith(".css"):
+                content = self.rewrite_css_urls(content.decode("utf-8"), asset_dir).encode("utf-8")
+
+            # Copies are named by the hash of their asset's content, rather
+            # than compared by content, since post-processing optimizes the
+            # copies in place.
+            root, extension = posixpath.splitext(path)
+            hashed_path = "%s.%s%s" % (root, hashlib.sha1(content).hexdigest()[:10], extension)
+            hashed_filepath = os.path.join(self.dist_dir, hashed_path)
+            if self.entries.get(path) != hashed_path or not os.path.isfile(hashed_filepath):
+                with open(hashed_filepath, "wb") as f:
+                    f.write(content)
+            self.entries[path] = hashed_path
+
+        # Remove the copies that are no longer referenced by the manifest.
+        hashed_paths = set(self.entries.values())
+        for filename in os.listdir(dir_path):
+            if HASHED_FILENAME_PATTERN.match(filename) and prefix + filename not in hashed_paths:
+                os.remove(os.path.join(dir_path, filename))
+
+
+    def rewrite_css_urls(self, css, asset_dir):
+        """
+        Rewrites the relative urls in a stylesheet to point to the hashed
+        copies of the assets they reference.
+        """
+        def rewrite(match):
+            url = match.group(2)
+            if ":" in url or url.startswith("/"):
+                return match.group(0)
+
+            path = posixpath.normpath(posixpath.join(asset_dir, url))
+            if path not in self.entries:
+                return match.group(0)
+
+            hashed_url = posixpath.relpath(self.entries[path], asset_dir)
+            return "url(%s%s%s)" % (match.group(1), hashed_url, match.group(1))
+
+        return CSS_URL_PATTERN.sub(rewrite, css)
+
+
+    def save(self):
+        os.makedirs(self.dist_dir, exist_ok=True)
+        with open(self.filepath, "w", encoding="utf-8") as f:
+            json.dump(self.entries, f, indent=0, sort_keys=True)
@@ -0,0 +1,108 @@
+#--------------------------------------------------------------------
+# linoone: build_cache.py
+#
+# Tracks which inputs each generated file was built from, so that
+# unchanged files can be skipped on subsequent builds.
+#--------------------------------------------------------------------
+import hashlib
+import json
+import os
+
+
+class BuildCache:
+    """
+    Maps generated files to a digest of the inputs they were built
+    from. The cache is stored as a JSON file.
+    """
+    def __init__(self, filepath):
+        self.filepath = filepath
+        self.entries = {}
+        try:
+            with open(filepath, "r", encoding="utf-8") as f:
+                self.entries = json.load(f)
+        except (OSError, ValueError):
+            pass
+
+
+    def is_current(self, key, digest):
+        """
+        Returns whether or not the file was already built from the
+        inputs with the given digest.
+        """
+        return digest is not None and self.entries.get(key) == digest
+
+
+    def set(self, key, digest):
+        self.entries[key] = digest
+
+
+    def remove_missing(self, root_dir, sub_dir):
+        """
+        Forgets the entries for files in the given directory that no
+        longer exist. The directory is only listed once, rather than
+        checking each file individually.
+        """
+        try:
+            existing = set(entry.name for entry in os.scandir(os.path.join(root_dir, sub_dir)))
+        except OSError:
+            existing = set()
+
+        prefix = sub_dir.rstrip("/") + "/"
+        for key in list(self.entries):
+            if key.startswith(prefix) and "/" not in key[len(prefix):] and key[len(prefix):] not in existing:
+                del self.entries[key]
+
+
+    def retain(self, keys):
+        """
+        Forgets the entries for every file that isn't one of the given keys.
+        """
+        keys = set(keys)
+        self.entries = {key: digest for key, digest in self.entries.items() if key in keys}
+
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.filepath), exist_ok=True)
+        with open(self.filepath, "w", encoding="utf-8") as f:
+            json.dump(self.entries, f, indent=0, sort_keys=True)
+
+
+def hash_file(filepath):
+    """
+    Returns the hex digest of the file's content, or None if the
+    file doesn't exist.
+    """
+    try:
+        with open(filepath, "rb") as f:
+            return hashlib.sha1(f.read()).hexdigest()
+    except OSError:
+        return None
+
+
+def hash_values(*values):
+    """
+    Returns the hex digest of the given JSON-serializable values, or
+    None if any of the values are None.
+    """
+    if any(value is None for value in values):
+        return None
+
+    return hashlib.sha1(json.dumps(values, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def write_if_changed(filepath, content):
+    """
+    Writes the text content to the file, unless the file already has the
+    same content, so that unchanged files keep their modification times.
+    Returns whether or not the file was written.
+    """
+    try:
+        with open(filepath, "r", encoding="utf-8") as f:
+            if f.read() == content:
+                return False
+    except OSError:
+        pass
+
+    with open(filepath, "w", encoding="utf-8") as f:
+        f.write(content)
+    return True
@@ -0,0 +1,228 @@
+#--------------------------------------------------------------------
+# linoone: evolution_chart.py
+#
+# Lays out evolution chains with a layered graph layout and renders
+# them as SVG, without needing graphviz.
+#--------------------------------------------------------------------
+from xml.sax.saxutils import escape, quoteattr
+
+# Sizes of the chart's elements, in pixels. Text widths are estimated
+# from the average width of a character in the chart's font.
+FONT_SIZE = 14
+CHAR_WIDTH = 7
+IMAGE_SIZE = 64
+NODE_PADDING = 8
+NODE_GAP = 16
+LAYER_GAP = 40
+EDGE_LABEL_PADDING = 8
+ARROW_LENGTH = 10
+ARROW_WIDTH = 7
+MARGIN = 4
+
+# Number of times the node order is swept through the layers to reduce
+# edge crossings.
+ORDERING_SWEEPS = 4
+
+
+def render_evolution_chart(graph):
+    """
+    Lays out an evolution graph from left to right and renders it as SVG.
+    The graph is a dict with a "title", a list of "nodes", and a list of
+    "edges". Each node has an "id", a "label", an "href", and an "image".
+    Each edge has a "from" and "to" node id and a "label". The SVG has the
+    same structure as graphviz's SVG output, and each node's group has the
+    node's id, so it can be linked to.
+    """
+    node_ids = [node["id"] for node in graph["nodes"]]
+    nodes = {node["id"]: node for node in graph["nodes"]}
+    edges = [edge for edge in graph["edges"] if edge["from"] in nodes and edge["to"] in nodes]
+    layers = order_layers(assign_layers(node_ids, edges), edges)
+    positions, width, height = position_nodes(layers, nodes, edges)
+
+    lines = [
+        '<svg width="%dpt" height="%dpt" viewBox="0.00 0.00 %d %d" xmlns="http://www.w3.org/2000/svg" xmlns:xlink="http://www.w3.org/1999/xlink">' % (width, height, width, height),
+        '<g id="graph0" class="graph" font-family="Times,serif" font-size="%d">' % FONT_SIZE,
+        '<title>%s</title>' % escape(graph["title"]),
+        '<polygon fill="white" stroke="none" points="0,0 %d,0 %d,%d 0,%d 0,0"/>' % (width, width, height, height),
+    ]
+    for node_id in node_ids:
+        node = nodes[node_id]
+        x, y, node_width, node_height = positions[node_id]
+        lines += [
+            '<g id=%s class="node">' % quoteattr(node_id),
+            '<title>%s</title>' % escape(node_id),
+            '<g id=%s><a xlink:href=%s xlink:title=%s target="_top">' % (quoteattr("a_" + node_id), quoteattr(node["href"]), quoteattr(node["label"])),
+            '<polygon fill="none" stroke="black" points="%d,%d %d,%d %d,%d %d,%d %d,%d"/>' % (
+                x, y, x + node_width, y, x + node_width, y + node_height, x, y + node_height, x, y
+            ),
+            '<text text-anchor="middle" x="%d" y="%d">%s</text>' % (x + node_width // 2, y + NODE_PADDING + FONT_SIZE - 2, escape(node["label"])),
+            '<image xlink:href=%s width="%dpx" height="%dpx" preserveAspectRatio="xMinYMin meet" x="%d" y="%d"/>' % (
+                quoteattr(node["image"]), IMAGE_SIZE, IMAGE_SIZE, x + (node_width - IMAGE_SIZE) // 2, y + NODE_PADDING * 2 + FONT_SIZE
+            ),
+            '</a>',
+            '</g>',
+            '</g>',
+        ]
+
+    for i, edge in enumerate(edges):
+        from_x, from_y, from_width, from_height = positions[edge["from"]]
+        to_x, to_y, to_width, to_height = positions[edge["to"]]
+        x1 = from_x + from_width
+        y1 = from_y + from_height // 2
+        x2 = to_x
+        y2 = to_y + to_height // 2
+        mid_x = (x1 + x2 - ARROW_LENGTH) // 2
+        lines += [
+            '<g id="edge%d" class="edge">' % (i + 1),
+            '<title>%s</title>' % escape("%s->%s" % (edge["from"], edge["to"])),
+            '<path fill="none" stroke="black" d="M%d,%d C%d,%d %d,%d %d,%d"/>' % (x1, y1, mid_x, y1, mid_x, y2, x2 - ARROW_LENGTH, y2),
+            '<polygon fill="black" stroke="black" points="%d,%d %d,%d %d,%d %d,%d"/>' % (
+                x2 - ARROW_LENGTH, y2 - ARROW_WIDTH // 2, x2, y2, x2 - ARROW_LENGTH, y2 + ARROW_WIDTH // 2, x2 - ARROW_LENGTH, y2 - ARROW_WIDTH // 2
+            ),
+            '<text text-anchor="middle" x="%d" y="%d">%s</text>' % (mid_x, (y1 + y2) // 2 - 4, escape(edge["label"])),
+            '</g>',
+        ]
+
+    lines += ['</g>', '</svg>']
+    return "\n".join(lines) + "\n"
+
+
+def assign_layers(node_ids, edges):
+    """
+    Assigns each node to the layer after its furthest predecessor, so that
+    every edge points to a later layer. Returns the list of layers, where
+    each layer is a list of node ids in the order they were given.
+    """
+    predecessors = {node_id: [] for node_id in node_ids}
+    successors = {node_id: [] for node_id in node_ids}
+    for edge in edges:
+        predecessors[edge["to"]].append(edge["from"])
+        successors[edge["from"]].append(edge["to"])
+
+    # Visit the nodes in topological order. Nodes that are part of a cycle
+    # are never ready, so they are placed by ignoring their unvisited
+    # predecessors.
+    ranks = {}
+    remaining = {node_id: len(predecessors[node_id]) for node_id in node_ids}
+    ready = [node_id for node_id in node_ids if remaining[node_id] == 0]
+    while len(ranks) < len(node_ids):
+        if len(ready) == 0:
+            ready = [next(node_id for node_id in node_ids if node_id not in ranks)]
+
+        node_id = ready.pop(0)
+        if node_id in ranks:
+            continue
+
+        ranks[node_id] = max([ranks[p] + 1 for p in predecessors[node_id] if p in ranks], default=0)
+        for successor in successors[node_id]:
+            remaining[successor] -= 1
+            if remaining[successor] == 0:
+                ready.append(successor)
+
+    layers = [[] for i in range(max(ranks.values(), default=-1) + 1)]
+    for node_id in node_ids:
+        layers[ranks[node_id]].append(node_id)
+
+    return layers
+
+
+def order_layers(layers, edges):
+    """
+    Reorders the nodes within each layer to reduce edge crossings. Each
+    sweep sorts the nodes by the average position of their neighbors in
+    the previous layers, and then in the following layers.
+    """
+    neighbors = {}
+    for edge in edges:
+        neighbors.setdefault(edge["to"], {"before": [], "after": []})["before"].append(edge["from"])
+        neighbors.setdefault(edge["from"], {"before": [], "after": []})["after"].append(edge["to"])
+
+    def sort_layer(layer, side, positions):
+        def barycenter(node_id):
+            linked = [positions[n] for n in neighbors.get(node_id, {}).get(side, []) if n in positions]
+            if len(linked) == 0:
+                return positions[node_id]
+            return sum(linked) / len(linked)
+        return sorted(layer, key=barycenter)
+
+    for sweep in range(ORDERING_SWEEPS):
+        for side, layer_indices in (("before", range(1, len(layers))), ("after", range(len(layers) - 2, -1, -1))):
+            for i in layer_indices:
+                positions = get_layer_positions(layers)
+                layers[i] = sort_layer(layers[i], side, positions)
+
+    return layers
+
+
+def get_layer_positions(layers):
+    """
+    Returns the position of each node within its layer.
+    """
+    return {node_id: i for layer in layers for i, node_id in enumerate(layer)}
+
+
+def position_nodes(layers, nodes, edges):
+    """
+    Computes the position and size of each node. Layers are placed from left
+    to right, with enough room between them for their edges' labels. Within
+    a layer, the nodes are stacked in order and the stack is centered on the
+    nodes' predecessors. Returns the (x, y, width, height) of each node, along
+    with the width and height of the chart.
+    """
+    sizes = {}
+    for node_id in nodes:
+        sizes[node_id] = (
+            max(IMAGE_SIZE, get_text_width(nodes[node_id]["label"])) + NODE_PADDING * 2,
+            FONT_SIZE + IMAGE_SIZE + NODE_PADDING * 3,
+        )
+
+    predecessors = {}
+    label_widths = {}
+    for edge in edges:
+        predecessors.setdefault(edge["to"], []).append(edge["from"])
+        label_widths[edge["from"]] = max(label_widths.get(edge["from"], 0), get_text_width(edge["label"]))
+
+    positions = {}
+    centers = {}
+    layer_x = MARGIN
+    for layer in layers:
+        layer_width = max(sizes[node_id][0] for node_id in layer)
+
+        # Stack the layer's nodes, and then shift the stack so the nodes are
+        # as close as possible to the average height of their predecessors.
+        offsets = []
+        offset = 0
+        for node_id in layer:
+            offsets.append(offset + sizes[node_id][1] / 2)
+            offset += sizes[node_id][1] + NODE_GAP
+
+        shifts = []
+        for node_id, node_offset in zip(layer, offsets):
+            linked = [centers[p] for p in predecessors.get(node_id, []) if p in centers]
+            if len(linked) > 0:
+                shifts.append(sum(linked) / len(linked) - node_offset)
+        shift = sum(shifts) / len(shifts) if len(shifts) > 0 else -(offset - NODE_GAP) / 2
+
+        for node_id, node_offset in zip(layer, offsets):
+            centers[node_id] = node_offset + shift
+            node_width, node_height = sizes[node_id]
+            positions[node_id] = [layer_x + (layer_width - node_width) // 2, centers[node_id] - node_height / 2, node_width, node_height]
+
+        label_width = max([label_widths.get(node_id, 0) for node_id in layer], default=0)
+        layer_x += layer_width + max(LAYER_GAP, label_width + EDGE_LABEL_PADDING * 2)
+
+    # Move the chart so its topmost node is at the top margin.
+    top = min(position[1] for position in positions.values())
+    for position in positions.values():
+        position[1] = int(round(position[1] - top + MARGIN))
+
+    width = max(position[0] + position[2] for position in positions.values()) + MARGIN
+    height = max(position[1] + position[3] for position in positions.values()) + MARGIN
+    return {node_id: tuple(position) for node_id, position in positions.items()}, width, height
+
+
+def get_text_width(text):
+    """
+    Estimates the width of the text in the chart's font.
+    """
+    return len(text) * CHAR_WIDTH
@@ -0,0 +1,170 @@
+#--------------------------------------------------------------------
+# linoone: file_watcher.py
+#
+# Watches directories for file changes. Uses inotify when it's
+# available, and falls back to polling file modification times.
+#--------------------------------------------------------------------
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import time
+
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_ISDIR = 0x40000000
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+EVENT_HEADER = struct.Struct("iIII")
+
+
+class FileWatcher:
+    """
+    Watches a set of directories for changed files. The dirs are
+    watched non-recursively, and the recursive_dirs are watched
+    along with all of their subdirectories.
+    """
+    def __init__(self, dirs, recursive_dirs=[], poll_interval=1.0, debounce=0.2):
+        self.dirs = set(os.path.realpath(d) for d in dirs if os.path.isdir(d))
+        self.recursive_dirs = set(os.path.realpath(d) for d in recursive_dirs if os.path.isdir(d))
+        self.poll_interval = poll_interval
+        self.debounce = debounce
+        self.inotify_fd = None
+        self.watch_dirs = {}
+        self.snapshot = {}
+        if not self.init_inotify():
+            print("inotify is unavailable. Polling for file changes instead.")
+            self.snapshot = self.take_snapshot()
+
+
+    def init_inotify(self):
+        """
+        Sets up inotify watches for all of the directories. Returns
+        False if inotify can't be used.
+        """
+        libc_name = ctypes.util.find_library("c")
+        if libc_name is None:
+            return False
+
+        try:
+            libc = ctypes.CDLL(libc_name, use_errno=True)
+            inotify_init1 = libc.inotify_init1
+            self.inotify_add_watch = libc.inotify_add_watch
+        except (OSError, AttributeError):
+            return False
+
+        self.inotify_fd = inotify_init1(os.O_CLOEXEC)
+        if self.inotify_fd < 0:
+            self.inotify_fd = None
+            return False
+
+        try:
+            for d in self.dirs:
+                self.add_watch(d)
+            for d in self.recursive_dirs:
+                for dirpath, dirs, files in os.walk(d):
+                    self.add_watch(dirpath)
+        except OSError:
+            # This usually means the user's inotify watch limit was reached.
+            os.close(self.inotify_fd)
+            self.inotify_fd = None
+            self.watch_dirs = {}
+            return False
+
+        return True
+
+
+    def add_watch(self, d):
+        wd = self.inotify_add_watch(self.inotify_fd, os.fsencode(d), WATCH_MASK)
+        if wd < 0:
+            raise OSError(ctypes.get_errno(), "Failed to watch %s" % d)
+        self.watch_dirs[wd] = d
+
+
+    def is_recursive(self, d):
+        return any(d == r or d.startswith(r + os.sep) for r in self.recursive_dirs)
+
+
+    def wait(self):
+        """
+        Blocks until one or more files change. Returns the set of
+        changed filepaths.
+        """
+        if self.inotify_fd is not None:
+            changed = self.read_inotify_events(None)
+            # Editors often write files in several steps, so keep gathering
+            # changes until things settle down.
+            while True:
+                more = self.read_inotify_events(self.debounce)
+                if not more:
+                    return changed
+                changed |= more
+
+        while True:
+            time.sleep(self.poll_interval)
+            snapshot = self.take_snapshot()
+            changed = set(path for path in snapshot.keys() | self.snapshot.keys()
+                          if snapshot.get(path) != self.snapshot.get(path))
+            self.snapshot = snapshot
+            if changed:
+                return changed
+
+
+    def read_inotify_events(self, timeout):
+        """
+        Reads the pending inotify events, waiting up to timeout seconds for
+        them. Returns the set of changed filepaths.
+        """
+        ready, _, _ = select.select([self.inotify_fd], [], [], timeout)
+        if not ready:
+            return set()
+
+        changed = set()
+        data = os.read(self.inotify_fd, 64 * 1024)
+        offset = 0
+        while offset < len(data):
+            wd, mask, cookie, length = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            name = os.fsdecode(data[offset:offset + length].rstrip(b"\0"))
+            offset += length
+            if wd not in self.watch_dirs:
+                continue
+
+            path = os.path.join(self.watch_dirs[wd], name)
+            if mask & IN_ISDIR:
+                if mask & (IN_CREATE | IN_MOVED_TO) and self.is_recursive(path):
+                    for dirpath, dirs, files in os.walk(path):
+                        self.add_watch(dirpath)
+                        changed.update(os.path.join(dirpath, f) for f in files)
+                continue
+
+            changed.add(path)
+
+        return changed
+
+
+    def take_snapshot(self):
+        """
+        Records the modification time and size of every watched file.
+        """
+        snapshot = {}
+        dirs = list(self.dirs)
+        for d in self.recursive_dirs:
+            for dirpath, subdirs, files in os.walk(d):
+                dirs.append(dirpath)
+
+        for d in dirs:
+            try:
+                entries = list(os.scandir(d))
+            except OSError:
+                continue
+
+            for entry in entries:
+                if entry.is_file():
+                    stat = entry.stat()
+                    snapshot[entry.path] = (stat.st_mtime_ns, stat.st_size)
+
+        return snapshot
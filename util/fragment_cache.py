@@ -0,0 +1,58 @@
+#--------------------------------------------------------------------
+# linoone: fragment_cache.py
+#
+# Jinja extension that renders repeated template fragments once and
+# reuses their markup.
+#--------------------------------------------------------------------
+from jinja2 import nodes
+from jinja2.ext import Extension
+
+from util.lru_cache import LRUCache
+
+# Maximum number of rendered fragments to keep.
+FRAGMENT_CACHE_SIZE = 16384
+
+
+class FragmentCacheExtension(Extension):
+    """
+    Adds a {% cache %} tag that caches the markup of its body. The tag
+    takes the values that the body depends on, which form the cache key:
+
+        {% cache "mon_table_entry", national_num %}...{% endcache %}
+
+    The body must only depend on the key's values, the core data, and
+    make_url(). Fragments are cached per make_url() function, since their
+    urls depend on the page's directory and the asset manifest. The cache
+    is stored on the environment as fragment_cache, and must be cleared
+    when the core data or templates change.
+    """
+    tags = {"cache"}
+
+    def __init__(self, environment):
+        super().__init__(environment)
+        environment.extend(fragment_cache=LRUCache(FRAGMENT_CACHE_SIZE))
+
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        key = [parser.parse_expression()]
+        while parser.stream.skip_if("comma"):
+            key.append(parser.parse_expression())
+
+        body = parser.parse_statements(["name:endcache"], drop_needle=True)
+        call = self.call_method("_render_fragment", [nodes.ContextReference(), nodes.List(key)])
+        return nodes.CallBlock(call, [], [], body).set_lineno(lineno)
+
+
+    def _render_fragment(self, context, key, caller):
+        """
+        Returns the cached markup for the key, rendering the body first if
+        it isn't cached.
+        """
+        key = (tuple(key), context.get("make_url"))
+        fragment = self.environment.fragment_cache.get(key)
+        if fragment is None:
+            fragment = caller()
+            self.environment.fragment_cache.put(key, fragment)
+
+        return fragment
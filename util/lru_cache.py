@@ -0,0 +1,50 @@
+#--------------------------------------------------------------------
+# linoone: lru_cache.py
+#
+# Provides a bounded least-recently-used cache.
+#--------------------------------------------------------------------
+from collections import OrderedDict
+
+
+class LRUCache:
+    """
+    Dict-like cache that holds at most maxsize items. When it's full,
+    the least-recently-used item is evicted.
+    """
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.items = OrderedDict()
+
+
+    def get(self, key, default=None):
+        """
+        Returns the cached item, or the default if it isn't cached.
+        """
+        if key not in self.items:
+            return default
+
+        self.items.move_to_end(key)
+        return self.items[key]
+
+
+    def put(self, key, value):
+        """
+        Caches the item, evicting the least-recently-used item if
+        the cache is full.
+        """
+        self.items[key] = value
+        self.items.move_to_end(key)
+        while len(self.items) > self.maxsize:
+            self.items.popitem(last=False)
+
+
+    def clear(self):
+        self.items.clear()
+
+
+    def __contains__(self, key):
+        return key in self.items
+
+
+    def __len__(self):
+        return len(self.items)
@@ -0,0 +1,69 @@
+#--------------------------------------------------------------------
+# linoone: minify.py
+#
+# Removes insignificant whitespace and comments from the generated
+# HTML, CSS, and SVG files.
+#--------------------------------------------------------------------
+import re
+
+# Elements whose content is kept exactly as-is when minifying HTML.
+RAW_HTML_ELEMENTS = ("pre", "textarea", "script")
+RAW_HTML_PATTERN = re.compile(r"(<(%s)\b.*?</\2\s*>)" % "|".join(RAW_HTML_ELEMENTS), re.DOTALL | re.IGNORECASE)
+STYLE_PATTERN = re.compile(r"(<style\b[^>]*>)(.*?)(</style\s*>)", re.DOTALL | re.IGNORECASE)
+HTML_COMMENT_PATTERN = re.compile(r"<!--(?!\[if).*?-->", re.DOTALL)
+CSS_COMMENT_PATTERN = re.compile(r"/\*.*?\*/", re.DOTALL)
+XML_COMMENT_PATTERN = re.compile(r"<!--.*?-->", re.DOTALL)
+WHITESPACE_PATTERN = re.compile(r"\s+")
+
+
+def collapse_whitespace(text):
+    """
+    Collapses each run of whitespace into a single newline or space. Browsers
+    render any run of whitespace the same way, so this doesn't change how
+    the page looks.
+    """
+    return WHITESPACE_PATTERN.sub(lambda match: "\n" if "\n" in match.group(0) else " ", text)
+
+
+def minify_html(html):
+    """
+    Minifies an HTML document. The content of preformatted elements and
+    scripts is left untouched, and inline stylesheets are minified as CSS.
+    """
+    parts = RAW_HTML_PATTERN.split(html)
+    result = []
+    # Splitting with two groups yields the text, the raw element, and the
+    # element's name, in that order.
+    for i in range(0, len(parts), 3):
+        text = HTML_COMMENT_PATTERN.sub("", parts[i])
+        text = STYLE_PATTERN.sub(lambda match: match.group(1) + minify_css(match.group(2)) + match.group(3), text)
+        result.append(collapse_whitespace(text))
+        if i + 1 < len(parts):
+            result.append(parts[i + 1])
+
+    return "".join(result).strip() + "\n"
+
+
+def minify_css(css):
+    """
+    Minifies a stylesheet.
+    """
+    css = CSS_COMMENT_PATTERN.sub("", css)
+    css = WHITESPACE_PATTERN.sub(" ", css)
+    css = re.sub(r"\s*([{};,])\s*", r"\1", css)
+    css = re.sub(r":\s+", ":", css)
+    css = css.replace(";}", "}")
+    return css.strip()
+
+
+def minify_svg(svg):
+    """
+    Minifies an SVG document by removing comments and the whitespace
+    between elements, unless the document preserves its whitespace.
+    """
+    svg = XML_COMMENT_PATTERN.sub("", svg)
+    if 'xml:space="preserve"' in svg:
+        return svg.strip()
+
+    svg = re.sub(r">\s+<", "><", svg)
+    return svg.strip()
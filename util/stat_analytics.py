@@ -0,0 +1,134 @@
+#--------------------------------------------------------------------
+# linoone: stat_analytics.py
+#
+# Computes base stat totals, percentile ranks, type ranks, and similar
+# species for every species at once, using vectorized array operations.
+#--------------------------------------------------------------------
+import numpy as np
+
+# Stat suffixes of the base stats fields, in the order of the stat
+# arrays' columns, and how pages label them.
+BASE_STAT_LABELS = [
+    ("HP", "HP"),
+    ("Attack", "Attack"),
+    ("Defense", "Defense"),
+    ("SpAttack", "Sp. Attack"),
+    ("SpDefense", "Sp. Defense"),
+    ("Speed", "Speed"),
+]
+
+# Number of species listed as having a similar stat spread.
+SIMILAR_SPECIES_COUNT = 5
+
+# Number of species whose distances to every other species are computed
+# at a time, which bounds the memory used by the nearest neighbor search.
+NEIGHBOR_BLOCK_SIZE = 256
+
+
+def create_stat_analytics(mon_base_stats, national_to_species, neighbor_count=SIMILAR_SPECIES_COUNT):
+    """
+    Computes the stat analytics of every species with a national dex
+    number. Returns a dict with the analytics of each species, and the
+    average stats of each type. Species are ranked against all of the
+    species, so the results don't depend on the entity filters.
+    """
+    species_list = [
+        national_to_species[national_num]
+        for national_num in sorted(national_to_species, key=int)
+        if national_to_species[national_num] in mon_base_stats
+    ]
+    stats = np.array([
+        [int(mon_base_stats[species]["base%s" % stat]) for stat, label in BASE_STAT_LABELS]
+        for species in species_list
+    ], dtype=np.int64).reshape(-1, len(BASE_STAT_LABELS))
+    type1s = np.array([mon_base_stats[species]["type1"] for species in species_list], dtype=object)
+    type2s = np.array([mon_base_stats[species]["type2"] for species in species_list], dtype=object)
+
+    totals = stats.sum(axis=1)
+    percentiles = get_percentile_ranks(np.column_stack([stats, totals])).tolist()
+    neighbors = get_nearest_neighbors(stats, neighbor_count).tolist()
+    type_ranks = get_type_ranks(totals, type1s, type2s)
+
+    species_analytics = {}
+    for i, species in enumerate(species_list):
+        species_analytics[species] = {
+            "total": int(totals[i]),
+            "stat_percentiles": percentiles[i][:-1],
+            "total_percentile": percentiles[i][-1],
+            "type_ranks": {},
+            "similar": [species_list[j] for j in neighbors[i]],
+        }
+
+    type_analytics = {}
+    for type_id, (members, ranks) in type_ranks.items():
+        for member, rank in zip(members.tolist(), ranks.tolist()):
+            species_analytics[species_list[member]]["type_ranks"][type_id] = {"rank": rank, "count": len(members)}
+        type_analytics[type_id] = {
+            "count": len(members),
+            "average_stats": np.rint(stats[members].mean(axis=0)).astype(int).tolist(),
+            "average_total": int(np.rint(totals[members].mean())),
+        }
+
+    return {
+        "species": species_analytics,
+        "types": type_analytics,
+    }
+
+
+def get_percentile_ranks(values):
+    """
+    Returns the percentile rank of each value among the values in its
+    column, which is the percentage of the values that are lower.
+    """
+    sorted_values = np.sort(values, axis=0)
+    lower_counts = np.empty_like(values)
+    for column in range(values.shape[1]):
+        lower_counts[:, column] = np.searchsorted(sorted_values[:, column], values[:, column], side="left")
+
+    return lower_counts * 100 // max(len(values), 1)
+
+
+def get_type_ranks(totals, type1s, type2s):
+    """
+    Ranks each type's species by their base stat totals, with the highest
+    total ranked first and tied totals sharing a rank. Returns a dict
+    mapping each type to the indices of its species and their ranks.
+    """
+    result = {}
+    for type_id in sorted(set(type1s.tolist()) | set(type2s.tolist())):
+        members = np.flatnonzero((type1s == type_id) | (type2s == type_id))
+        member_totals = totals[members]
+        greater_counts = len(members) - np.searchsorted(np.sort(member_totals), member_totals, side="right")
+        result[type_id] = (members, greater_counts + 1)
+
+    return result
+
+
+def get_nearest_neighbors(stats, count):
+    """
+    Returns the indices of each species' nearest neighbors by the
+    Euclidean distance between their base stats, nearest first. A species
+    is never its own neighbor, and species at the same distance are
+    ordered by their indices.
+    """
+    num_species = len(stats)
+    count = min(count, num_species - 1)
+    if count <= 0:
+        return np.empty((num_species, 0), dtype=np.intp)
+
+    result = np.empty((num_species, count), dtype=np.intp)
+    indices = np.arange(num_species)
+    for start in range(0, num_species, NEIGHBOR_BLOCK_SIZE):
+        block = stats[start:start + NEIGHBOR_BLOCK_SIZE]
+        differences = block[:, np.newaxis, :] - stats[np.newaxis, :, :]
+        # Squared distances are exact integers, so each key is unique when
+        # combined with the neighbor's index, which makes ties stable.
+        keys = (differences * differences).sum(axis=2) * num_species + indices
+        rows = np.arange(len(block))
+        keys[rows, rows + start] = np.iinfo(np.int64).max
+
+        nearest = np.argpartition(keys, count - 1, axis=1)[:, :count]
+        order = np.argsort(np.take_along_axis(keys, nearest, axis=1), axis=1)
+        result[start:start + len(block)] = np.take_along_axis(nearest, order, axis=1)
+
+    return result
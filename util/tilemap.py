@@ -0,0 +1,132 @@
+#--------------------------------------------------------------------
+# linoone: tilemap.py
+#
+# Renders GBA tiles and tilemaps using vectorized array operations.
+#--------------------------------------------------------------------
+import numpy as np
+from PIL import Image
+
+
+def tiles_from_image(img):
+    """
+    Splits an indexed tilesheet image into an array of shape
+    (num_tiles, 8, 8) of color indices. Tiles are ordered left-to-right,
+    then top-to-bottom.
+    """
+    pixels = np.asarray(img, dtype=np.uint8)
+    rows = pixels.shape[0] // 8
+    columns = pixels.shape[1] // 8
+    pixels = pixels[:rows * 8, :columns * 8]
+    return pixels.reshape(rows, 8, columns, 8).swapaxes(1, 2).reshape(rows * columns, 8, 8)
+
+
+def read_tilemap(data, width, affine=False):
+    """
+    Reads a GBA tilemap into a 2D array of tilemap entries. Text-mode
+    tilemaps have 16-bit entries. Affine tilemaps have 8-bit entries,
+    which are only tile ids.
+    """
+    dtype = np.uint8 if affine else np.dtype("<u2")
+    entries = np.frombuffer(data, dtype=dtype).astype(np.uint16)
+    height = len(entries) // width
+    return entries[:width * height].reshape(height, width)
+
+
+def render_tilemap(tiles, entries, bpp=4, affine=False):
+    """
+    Renders a 2D array of tilemap entries into a 2D array of color indices.
+
+    Text-mode entries are made of a 10-bit tile id, horizontal and vertical
+    flip bits, and a 4-bit palette number. For 4bpp tiles, the palette number
+    selects which 16-color palette the tile uses, so the resulting color
+    indices are offset into a 256-color palette. Color 0 of each 16-color
+    palette is transparent. Affine entries are only tile ids.
+    """
+    entries = np.asarray(entries, dtype=np.uint16)
+    if affine:
+        tile_ids = entries
+        hflip = np.zeros(entries.shape, dtype=bool)
+        vflip = hflip
+        palettes = np.zeros(entries.shape, dtype=np.uint8)
+    else:
+        tile_ids = entries & 0x3FF
+        hflip = (entries & 0x400) != 0
+        vflip = (entries & 0x800) != 0
+        palettes = (entries >> 12).astype(np.uint8)
+
+    # Tile ids beyond the tileset are rendered as the first tile, which is
+    # the same thing the hardware does with empty VRAM.
+    tile_ids = np.where(tile_ids < len(tiles), tile_ids, 0)
+    pixels = tiles[tile_ids]
+
+    # Apply the flips by indexing each tile's rows and columns in reverse.
+    height, width = entries.shape
+    offsets = np.arange(8)
+    row_indices = np.where(vflip[:, :, None], 7 - offsets, offsets)
+    column_indices = np.where(hflip[:, :, None], 7 - offsets, offsets)
+    pixels = pixels[
+        np.arange(height)[:, None, None, None],
+        np.arange(width)[None, :, None, None],
+        row_indices[:, :, :, None],
+        column_indices[:, :, None, :]
+    ]
+
+    if bpp == 4:
+        pixels = (pixels & 0xF) + palettes[:, :, None, None] * 16
+
+    return pixels.swapaxes(1, 2).reshape(height * 8, width * 8)
+
+
+def is_transparent(indices, bpp=4):
+    """
+    Returns a boolean array of which color indices are transparent.
+    """
+    if bpp == 4:
+        return (indices & 0xF) == 0
+    return indices == 0
+
+
+def create_image(indices, palette):
+    """
+    Creates an indexed image from a 2D array of color indices and a
+    flat list of RGB palette colors.
+    """
+    indices = np.ascontiguousarray(indices, dtype=np.uint8)
+    img = Image.frombytes("P", (indices.shape[1], indices.shape[0]), indices.tobytes())
+    img.putpalette(palette)
+    return img
+
+
+def render_metatiles(tiles, metatile_entries, bpp=4):
+    """
+    Renders an array of metatiles into an array of shape (num_metatiles, 16, 16)
+    of color indices. Each metatile is made of 8 tilemap entries, which are a
+    bottom layer of 2x2 tiles followed by a top layer of 2x2 tiles. The top
+    layer is drawn over the bottom layer, except where it's transparent.
+    """
+    metatile_entries = np.asarray(metatile_entries, dtype=np.uint16)
+    num_metatiles = len(metatile_entries)
+
+    # Lay out every 2x2 layer in a single column, so that all of the
+    # metatiles are rendered in one pass.
+    pixels = render_tilemap(tiles, metatile_entries.reshape(num_metatiles * 4, 2), bpp)
+    layers = pixels.reshape(num_metatiles, 2, 16, 16)
+    bottom = layers[:, 0]
+    top = layers[:, 1]
+    pixels = np.where(is_transparent(top, bpp), bottom, top)
+
+    # Pixels that are transparent in both layers show the backdrop color,
+    # which is the first color of the first palette.
+    return np.where(is_transparent(pixels, bpp), 0, pixels)
+
+
+def render_blocks(metatiles, blocks):
+    """
+    Renders a 2D array of metatile ids into a 2D array of color indices.
+    Metatile ids beyond the given metatiles are rendered as the first
+    metatile.
+    """
+    blocks = np.asarray(blocks)
+    block_ids = np.where(blocks < len(metatiles), blocks, 0)
+    height, width = blocks.shape
+    return metatiles[block_ids].swapaxes(1, 2).reshape(height * 16, width * 16)
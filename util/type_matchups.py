@@ -0,0 +1,88 @@
+#--------------------------------------------------------------------
+# linoone: type_matchups.py
+#
+# Builds the dense type effectiveness matrix, and computes the type
+# matchups of every type and species with array operations.
+#--------------------------------------------------------------------
+import numpy as np
+
+
+def create_type_matrix(type_effectiveness, type_ids):
+    """
+    Creates the type effectiveness matrix, where the value at [a, d] is
+    the damage multiplier of an attack of type a against a Pokémon of
+    type d. Pairs that aren't in the table deal normal damage, and pairs
+    that are in the table more than once have their multipliers combined,
+    like in battle.
+    """
+    type_indices = {type_id: i for i, type_id in enumerate(type_ids)}
+    entries = [
+        (type_indices[entry["attacker"]], type_indices[entry["defender"]], entry["multiplier"] / 10)
+        for entry in type_effectiveness
+        if entry["attacker"] in type_indices and entry["defender"] in type_indices
+    ]
+
+    matrix = np.ones((len(type_ids), len(type_ids)))
+    if len(entries) > 0:
+        attackers, defenders, multipliers = zip(*entries)
+        np.multiply.at(matrix, (list(attackers), list(defenders)), multipliers)
+
+    return matrix
+
+
+def create_type_matchups(type_effectiveness, type_names):
+    """
+    Returns the matchups of each type, both when attacking and when
+    defending. Each matchup lists the types and their multipliers,
+    omitting the ones that deal normal damage.
+    """
+    type_ids = list(type_names)
+    matrix = create_type_matrix(type_effectiveness, type_ids)
+    result = {}
+    for i, type_id in enumerate(type_ids):
+        result[type_id] = {
+            "attacking": get_matchups(type_ids, matrix[i]),
+            "defending": get_matchups(type_ids, matrix[:, i]),
+        }
+
+    return result
+
+
+def create_defensive_profiles(type_effectiveness, type_names, mon_base_stats, national_to_species):
+    """
+    Returns the multiplier of each attacking type against each species
+    with a national dex number, omitting the ones that deal normal
+    damage. A species takes the product of its types' multipliers, which
+    is computed for every species at once.
+    """
+    type_ids = list(type_names)
+    type_indices = {type_id: i for i, type_id in enumerate(type_ids)}
+    matrix = create_type_matrix(type_effectiveness, type_ids)
+    species_list = [species for species in national_to_species.values() if species in mon_base_stats]
+    type1s = np.array([type_indices[mon_base_stats[species]["type1"]] for species in species_list], dtype=np.intp)
+    type2s = np.array([type_indices[mon_base_stats[species]["type2"]] for species in species_list], dtype=np.intp)
+
+    # Single-typed species have the same type twice, which only counts once.
+    multipliers = matrix[:, type1s] * np.where(type2s != type1s, matrix[:, type2s], 1.0)
+    return {species: get_matchups(type_ids, multipliers[:, i]) for i, species in enumerate(species_list)}
+
+
+def get_matchups(type_ids, multipliers):
+    """
+    Groups the types by whether their multipliers are above or below
+    normal damage. Super effective matchups are listed from the highest
+    multiplier, and not very effective ones from the lowest, starting
+    with the ones that have no effect.
+    """
+    above = np.flatnonzero(multipliers > 1)
+    below = np.flatnonzero(multipliers < 1)
+    return {
+        "super_effective": [
+            {"type": type_ids[i], "multiplier": float(multipliers[i])}
+            for i in above[np.argsort(-multipliers[above], kind="stable")]
+        ],
+        "not_very_effective": [
+            {"type": type_ids[i], "multiplier": float(multipliers[i])}
+            for i in below[np.argsort(multipliers[below], kind="stable")]
+        ],
+    }
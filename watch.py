@@ -0,0 +1,172 @@
+#--------------------------------------------------------------------
+# linoone: watch.py
+#
+# Keeps the core data, parsed C files, and templates in memory, and
+# incrementally rebuilds the website when the project's source files
+# or the templates change.
+#--------------------------------------------------------------------
+import os
+import traceback
+
+from jinja2 import meta
+
+from postprocess import postprocess_dist
+from setup.core_data import project_data, get_dataset_keys, load_data
+from setup.parse_code import clear_ast_cache, get_file_dependencies
+from util.file_watcher import FileWatcher
+
+
+class IncrementalBuilder:
+    """
+    Rebuilds only the parts of the website that are affected by
+    changed files. The generators are expected to have already been
+    run once.
+    """
+    def __init__(self, config, env, core_data, generators, templates_dir):
+        self.config = config
+        self.env = env
+        self.core_data = core_data
+        self.generators = generators
+        self.templates_dir = os.path.realpath(templates_dir)
+        self.dataset_dependencies = {}
+        for name in project_data:
+            if any(key in core_data for key in get_dataset_keys(name)):
+                self.dataset_dependencies[name] = self.find_dataset_dependencies(name)
+
+
+    def find_dataset_dependencies(self, name):
+        """
+        Returns the set of project files (or directories) that the given
+        dataset is read from, including any files #included by its C files.
+        """
+        dependencies = set()
+        for source in project_data[name]["sources"]:
+            filepath = os.path.realpath(os.path.join(self.config["project_dir"], source))
+            if filepath.endswith(".c"):
+                dependencies.update(get_file_dependencies(filepath, self.config["project_dir"]))
+            else:
+                dependencies.add(filepath)
+
+        return dependencies
+
+
+    def watch(self):
+        """
+        Watches the project and templates for changes forever.
+        """
+        dirs = set([self.templates_dir])
+        recursive_dirs = set()
+        for dependencies in self.dataset_dependencies.values():
+            for filepath in dependencies:
+                if os.path.isdir(filepath):
+                    recursive_dirs.add(filepath)
+                else:
+                    dirs.add(os.path.dirname(filepath))
+
+        watcher = FileWatcher(dirs, recursive_dirs)
+        print("Watching for changes. Press Ctrl+C to stop.")
+        while True:
+            changed_filepaths = watcher.wait()
+            try:
+                self.rebuild(changed_filepaths)
+            except Exception:
+                # Files are often in a broken state while they are being
+                # edited, so keep watching instead of exiting.
+                traceback.print_exc()
+
+
+    def rebuild(self, changed_filepaths):
+        """
+        Re-extracts the datasets and re-renders the pages that are
+        affected by the changed files.
+        """
+        changed_datasets = set()
+        for name, dependencies in self.dataset_dependencies.items():
+            if any(is_dependency(filepath, dependencies) for filepath in changed_filepaths):
+                changed_datasets.add(name)
+
+        changed_templates = set()
+        for filepath in changed_filepaths:
+            if filepath.startswith(self.templates_dir + os.sep):
+                changed_templates.add(os.path.relpath(filepath, self.templates_dir).replace(os.sep, "/"))
+
+        if not changed_datasets and not changed_templates:
+            return
+
+        # The parsed abstract syntax trees are stale if any file they
+        # depend on changed.
+        stale_filepaths = set()
+        for name in changed_datasets:
+            for source in project_data[name]["sources"]:
+                stale_filepaths.add(os.path.join(self.config["project_dir"], source))
+        clear_ast_cache(stale_filepaths)
+
+        # Cached template fragments are stale if the data or templates
+        # they were rendered from changed.
+        self.env.fragment_cache.clear()
+
+        changed_keys = set()
+        for name in sorted(changed_datasets):
+            print("Re-extracting %s" % name)
+            d = load_data(name, self.config, force=True)
+            data_keys = get_dataset_keys(name)
+            if len(data_keys) == 1:
+                self.core_data[name] = d
+            else:
+                self.core_data.update(zip(data_keys, d))
+            changed_keys.update(data_keys)
+            self.dataset_dependencies[name] = self.find_dataset_dependencies(name)
+
+        template_dependencies = {}
+        for generator in self.generators:
+            if changed_keys.intersection(generator.required_data):
+                print("Rebuilding %s" % generator.name)
+                generator.custom_data = {}
+                generator.run(self.env)
+                continue
+
+            if not changed_templates:
+                continue
+
+            pages = []
+            for page in generator.get_pages():
+                template_name = page[0]
+                if template_name not in template_dependencies:
+                    template_dependencies[template_name] = get_template_dependencies(self.env, template_name)
+                if changed_templates.intersection(template_dependencies[template_name]):
+                    pages.append(page)
+
+            if pages:
+                print("Re-rendering %d %s page(s)" % (len(pages), generator.name))
+            for template_name, dest_filepath, extra_data in pages:
+                generator.render_template(self.env, template_name, dest_filepath, extra_data)
+
+        postprocess_dist(self.config)
+
+
+def is_dependency(filepath, dependencies):
+    """
+    Returns whether or not the filepath is one of the dependencies, or
+    is located inside one of the dependency directories.
+    """
+    if filepath in dependencies:
+        return True
+
+    return any(filepath.startswith(d + os.sep) for d in dependencies)
+
+
+def get_template_dependencies(env, template_name, result=None):
+    """
+    Returns the set of templates the given template is made from, which
+    includes itself and any templates it extends, imports, or includes.
+    """
+    if result is None:
+        result = set()
+
+    result.add(template_name)
+    source = env.loader.get_source(env, template_name)[0]
+    for name in meta.find_referenced_templates(env.parse(source)):
+        if name is not None and name not in result:
+            get_template_dependencies(env, name, result)
+
+    return result